@@ -0,0 +1,393 @@
+#!/usr/bin/env python3
+"""
+GROSRAT - Benchmarks hors ligne
+
+Rejoue des pages Toppreise enregistrees dans search_product et
+get_product_details (grosrat.FETCHER injecte, aucun acces au site),
+mesure un cycle complet de suivi contre un serveur HTTP local, puis la
+memoire d'une grande liste suivie (dicts JSON contre TrackedEntry).
+
+    python benchmarks/bench_grosrat.py
+    python benchmarks/bench_grosrat.py --json bench.json
+    python benchmarks/bench_grosrat.py --baseline bench.json --max-regression 25
+
+Le corpus de base est genere depuis la page produit enregistree
+(debug_page.html, 23 offres): petite page (3 offres), page typique,
+grande page (200 offres) et pages de resultats de recherche.
+--fixtures DIR ajoute les pages *.html d'un dossier (search_*.html pour
+la recherche, les autres comme pages produit).
+"""
+
+import argparse
+import copy
+import glob
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import grosrat  # noqa: E402
+from bs4 import BeautifulSoup  # noqa: E402
+
+TEMPLATE = os.path.join(ROOT, 'debug_page.html')
+BASE = "https://www.toppreise.ch"
+
+
+# =============================================================================
+# CORPUS
+# =============================================================================
+
+def make_product_page(template, n_offers):
+    """Page produit a n_offers offres, construite en clonant les offres enregistrees"""
+    soup = BeautifulSoup(template, 'html.parser')
+    offer_list = soup.select_one('.f_standardList')
+    originals = offer_list.find_all('div', class_='Plugin_Offer', recursive=False)
+    for offer in originals:
+        offer.extract()
+    
+    for i in range(n_offers):
+        offer = copy.copy(originals[i % len(originals)])
+        rnd = i // len(originals)
+        if rnd:
+            # Clones: shops distincts, prix decales
+            for img in offer.select('.Plugin_ShopLogo img'):
+                img['alt'] = f"{img.get('alt') or 'shop'} {rnd}"
+            for price_div in offer.select('.Plugin_Price'):
+                price = grosrat.parse_chf(price_div.get_text())
+                if price:
+                    price_div.string = f" {price + rnd * 3.5:.2f} "
+        offer_list.append(offer)
+    return str(soup)
+
+
+def make_search_page(template, n_results):
+    """Page de resultats de recherche a n_results produits"""
+    head = template[:template.find('<body')]
+    cards = []
+    for i in range(n_results):
+        slug = f"GARMIN-fenix-8-Pro-AMOLED-Sapphire-Variante-{i:03d}-010-03199-{i:02d}"
+        href = f"/preisvergleich/Activity-Tracker-Smartwatches/{slug}-p{900000 + i}"
+        cards.append(
+            f'<div class="Plugin_Product col-12"><a href="{href}"><img src="/img/{900000 + i}.jpg" '
+            f'alt="{slug}"></a><div class="productTitle"><a href="{href}?tab=offers">'
+            f'{slug.replace("-", " ")}</a></div><div class="Plugin_Price">{199 + i}.00</div>'
+            f'<div class="offers">{3 + i % 40} Angebote ab CHF {199 + i}.00</div></div>')
+    return f'{head}<body><div class="searchResults">{"".join(cards)}</div></body></html>'
+
+
+def build_corpus(fixtures_dir=None):
+    """Retourne {'search': {nom: html}, 'product': {nom: html}}"""
+    with open(TEMPLATE, 'r', encoding='utf-8') as f:
+        template = f.read()
+    
+    corpus = {
+        'search': {
+            'search_small': make_search_page(template, 5),
+            'search_large': make_search_page(template, 200),
+        },
+        'product': {
+            'product_small': make_product_page(template, 3),
+            'product_typical': template,
+            'product_200': make_product_page(template, 200),
+        },
+    }
+    
+    if fixtures_dir:
+        for path in sorted(glob.glob(os.path.join(fixtures_dir, '*.html'))):
+            name = os.path.splitext(os.path.basename(path))[0]
+            with open(path, 'r', encoding='utf-8') as f:
+                kind = 'search' if name.startswith('search') else 'product'
+                corpus[kind][name] = f.read()
+    return corpus
+
+
+def save_corpus(corpus, folder):
+    os.makedirs(folder, exist_ok=True)
+    for pages in corpus.values():
+        for name, html in pages.items():
+            with open(os.path.join(folder, name + '.html'), 'w', encoding='utf-8') as f:
+                f.write(html)
+
+
+# =============================================================================
+# SOURCE DES PAGES INJECTEE
+# =============================================================================
+
+class CorpusFetcher(grosrat.Fetcher):
+    """Remplace grosrat.FETCHER: chaque GET renvoie la page courante du corpus"""
+    
+    def __init__(self):
+        self.page = ""
+    
+    def get(self, url, headers=None):
+        return grosrat.StoredResponse(url, 200, self.page)
+
+
+# =============================================================================
+# MESURES
+# =============================================================================
+
+def measure(fn, repeat):
+    """Temps median (ms), pic memoire (Ko) et blocs alloues restants d'un appel"""
+    fn()  # Echauffement
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append((time.perf_counter() - t0) * 1000)
+    
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    del result
+    
+    return {
+        'median_ms': round(statistics.median(times), 3),
+        'min_ms': round(min(times), 3),
+        'peak_kb': round(peak / 1024, 1),
+        'alloc_blocks': blocks,
+    }
+
+
+def bench_parsing(corpus, repeat):
+    replay = CorpusFetcher()
+    grosrat.FETCHER = replay
+    grosrat.HTTP_CACHE = grosrat.ResponseCache(path=None)
+    results = {}
+    
+    for name, html in corpus['search'].items():
+        replay.page = html
+        results[name] = measure(lambda: grosrat.search_product("fenix 8"), repeat)
+        results[name]['bytes'] = len(html)
+    
+    for name, html in corpus['product'].items():
+        replay.page = html
+        results[name] = measure(
+            lambda: grosrat.get_product_details(f"{BASE}/preisvergleich/X/Bench-p1", silent=True), repeat)
+        results[name]['bytes'] = len(html)
+    return results
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """
+    Serveur local: toute URL renvoie la page produit choisie, avec un ETag
+    fixe (304 sur If-None-Match) pour mesurer aussi le cycle avec cache.
+    """
+    
+    protocol_version = 'HTTP/1.1'
+    page = b""
+    active = 0          # Requetes en cours, et maximum observe pendant le cycle
+    peak = 0
+    lock = threading.Lock()
+    
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.active += 1
+            cls.peak = max(cls.peak, cls.active)
+        try:
+            self._respond()
+        finally:
+            with cls.lock:
+                cls.active -= 1
+    
+    def _respond(self):
+        if self.headers.get('If-None-Match') == '"bench"':
+            self.send_response(304)
+            self.send_header('ETag', '"bench"')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(self.page)))
+        self.send_header('ETag', '"bench"')
+        self.end_headers()
+        self.wfile.write(self.page)
+    
+    def log_message(self, *args):
+        pass
+
+
+def bench_cycle(html, n_products, workers):
+    """Cycle complet (run_batch) de n_products articles contre un serveur local"""
+    PageHandler.page = html.encode('utf-8')
+    server = ThreadingHTTPServer(('127.0.0.1', 0), PageHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    
+    tmp = tempfile.mkdtemp(prefix='grosrat-bench-')
+    grosrat.BASE_URL = f"http://{host}:{port}"
+    grosrat.FETCHER = grosrat.LiveFetcher(grosrat.HttpClient(pool_size=workers, rate_limiter=None))
+    grosrat.HTTP_CACHE = grosrat.ResponseCache(path=None, max_entries=n_products)
+    grosrat.HISTORY = grosrat.PriceHistory(os.path.join(tmp, 'history.db'))
+    grosrat.ALERTS = grosrat.AlertState(path=None)
+    grosrat.MAX_WORKERS = workers
+    
+    entries = [grosrat.TrackedEntry.from_dict({
+        'id': i,
+        'product': {'title': f"Bench {i}", 'reference': '', 'url': f"{grosrat.BASE_URL}/x/Bench-{i}-p{i}"},
+        'threshold': 1.0,
+        'active': True,
+    }) for i in range(1, n_products + 1)]
+    
+    results = {}
+    try:
+        # cold: pages completes; warm: 304 et resultats du cache
+        for label in ('cold', 'warm'):
+            PageHandler.peak = 0
+            t0 = time.perf_counter()
+            grosrat.run_batch(entries, '')
+            elapsed = time.perf_counter() - t0
+            results[label] = {
+                'seconds': round(elapsed, 3),
+                'checks_per_s': round(n_products / elapsed, 1),
+                'peak_concurrency': PageHandler.peak,
+            }
+    finally:
+        server.shutdown()
+        grosrat.HISTORY.close()
+    return results
+
+
+def bench_watchlist(n_entries):
+    """Memoire retenue par une liste de n_entries articles: dicts JSON contre TrackedEntry"""
+    text = json.dumps({'products': [{
+        'id': i,
+        'product': {'title': f"Garmin Fenix 8 AMOLED 47mm Bench {i}", 'reference': f"010-0{i:05d}-00",
+                    'url': f"{BASE}/preisvergleich/Smartwatches/Bench-{i}-p{i}", 'best_price': 700.0 + i % 100},
+        'threshold': 650.0,
+        'active': True,
+        'created': "2026-01-01T12:00:00",
+    } for i in range(1, n_entries + 1)]})
+    
+    def retained(build):
+        tracemalloc.start()
+        result = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        del result
+        return current
+    
+    dicts = retained(lambda: json.loads(text)['products'])
+    records = retained(lambda: [grosrat.TrackedEntry.from_dict(p) for p in json.loads(text)['products']])
+    return {
+        'entries': n_entries,
+        'dicts_kb': round(dicts / 1024, 1),
+        'records_kb': round(records / 1024, 1),
+        'saved_pct': round(100 * (1 - records / dicts), 1),
+    }
+
+
+# =============================================================================
+# MAIN
+# =============================================================================
+
+def print_report(report):
+    print(f"Parseur: {report['parser']}")
+    print()
+    print(f"{'Page':<18}{'Taille':>10}{'Mediane':>12}{'Min':>12}{'Pic':>12}{'Blocs':>10}")
+    print('-' * 74)
+    for name, r in report['pages'].items():
+        print(f"{name:<18}{r['bytes'] // 1024:>8}Ko{r['median_ms']:>10.2f}ms{r['min_ms']:>10.2f}ms"
+              f"{r['peak_kb']:>10.0f}Ko{r['alloc_blocks']:>10}")
+    
+    if report.get('cycle'):
+        c = report['cycle']
+        print()
+        print(f"Cycle: {c['products']} articles, {c['workers']} workers")
+        for label in ('cold', 'warm'):
+            print(f"  {label:<5} {c[label]['seconds']:>8.2f}s  {c[label]['checks_per_s']:>8.1f} verif/s"
+                  f"  {c[label]['peak_concurrency']:>3} requetes simultanees au plus")
+    
+    if report.get('watchlist'):
+        w = report['watchlist']
+        print()
+        print(f"Liste suivie: {w['entries']} articles")
+        print(f"  dicts         {w['dicts_kb']:>10.0f}Ko")
+        print(f"  TrackedEntry  {w['records_kb']:>10.0f}Ko  (-{w['saved_pct']:g}%)")
+
+
+def check_regressions(report, baseline_path, max_pct):
+    """Compare les medianes a une reference, retourne la liste des regressions"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+    regressions = []
+    for name, r in report['pages'].items():
+        ref = baseline.get('pages', {}).get(name)
+        if ref and r['median_ms'] > ref['median_ms'] * (1 + max_pct / 100):
+            regressions.append(f"{name}: {ref['median_ms']:.2f}ms -> {r['median_ms']:.2f}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks hors ligne de GROSRAT")
+    parser.add_argument('--repeat', type=int, default=5, help="Mesures par page (mediane)")
+    parser.add_argument('--parser', default=grosrat.PARSER_BACKEND,
+                        help="Backend: auto, selectolax, lxml, html.parser")
+    parser.add_argument('--fixtures', help="Dossier de pages *.html supplementaires")
+    parser.add_argument('--save-fixtures', help="Ecrire le corpus genere dans ce dossier")
+    parser.add_argument('--products', type=int, default=100, help="Articles du cycle complet (0 = pas de cycle)")
+    parser.add_argument('--workers', type=int, default=grosrat.MAX_WORKERS)
+    parser.add_argument('--watchlist', type=int, default=20000,
+                        help="Articles de la mesure memoire de la liste suivie (0 = pas de mesure)")
+    parser.add_argument('--json', help="Ecrire les resultats en JSON")
+    parser.add_argument('--baseline', help="Resultats JSON de reference")
+    parser.add_argument('--max-regression', type=float, default=20.0,
+                        help="Ralentissement tolere par rapport a la reference (%%)")
+    args = parser.parse_args()
+    
+    grosrat.UI.headless = True
+    logging.basicConfig(level=logging.WARNING)
+    grosrat.PARSER = grosrat.get_parser_backend(args.parser)
+    
+    corpus = build_corpus(args.fixtures)
+    if args.save_fixtures:
+        save_corpus(corpus, args.save_fixtures)
+    
+    report = {
+        'parser': grosrat.PARSER.name,
+        'pages': bench_parsing(corpus, args.repeat),
+    }
+    if args.products:
+        report['cycle'] = {
+            'products': args.products,
+            'workers': args.workers,
+            **bench_cycle(corpus['product']['product_typical'], args.products, args.workers),
+        }
+    
+    if args.watchlist:
+        report['watchlist'] = bench_watchlist(args.watchlist)
+    
+    print_report(report)
+    
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    
+    if args.baseline:
+        regressions = check_regressions(report, args.baseline, args.max_regression)
+        if regressions:
+            print()
+            print(f"Regressions (> {args.max_regression:g}%):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -4,15 +4,49 @@ GROSRAT - Price Tracker pour Toppreise.ch
 Suivi automatique de prix avec alertes Discord
 """
 
+import abc
+import argparse
+import csv
+import logging
+import signal
+import socket
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
 import time
 import re
-from datetime import datetime
+from datetime import datetime, timedelta
 import json
+import hashlib
+import math
 import os
+import sqlite3
 import sys
+import atexit
+import queue
+import heapq
+import itertools
+import tempfile
+import gzip
+import shutil
 import threading
+import cProfile
+import io
+import pstats
+import tracemalloc
+from collections import OrderedDict, deque
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from dataclasses import dataclass
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, urlunsplit, quote
+
+# dataclass(slots=True) (TrackedEntry, Product, Offer)
+if sys.version_info < (3, 10):
+    sys.exit("GROSRAT necessite Python 3.10 ou plus recent")
 
 # Pour la detection de touche
 try:
@@ -22,14 +56,104 @@ except ImportError:
     HAS_MSVCRT = False
     import select  # Unix
 
+# Decompression brotli (optionnelle, utilisee par urllib3 si installee)
+try:
+    import brotli  # noqa: F401
+    HAS_BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        HAS_BROTLI = True
+    except ImportError:
+        HAS_BROTLI = False
+
+# Parseurs HTML compiles (optionnels, html.parser sinon)
+try:
+    from selectolax.lexbor import LexborHTMLParser
+    HAS_SELECTOLAX = True
+except ImportError:
+    HAS_SELECTOLAX = False
+
+try:
+    import lxml  # noqa: F401
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
 # =============================================================================
 # CONFIGURATION
 # =============================================================================
 
-CHECK_INTERVAL_HOURS = 6
+CHECK_INTERVAL_HOURS = 6   # Intervalle par defaut (surcharge par article: 'interval_hours')
+MIN_INTERVAL_SECONDS = 60  # Intervalle minimal d'un article, quel que soit 'interval_hours'
+BATCH_RETRY_SECONDS = 300  # Daemon: delai avant de retenter un lot en echec
+CONFIG_POLL_SECONDS = 30   # Frequence de detection des modifications de la liste (0 = jamais)
+
+# Frequence adaptative: rapprocher les verifications des articles proches du
+# seuil ou volatils, espacer celles des articles stables depuis des jours
+ADAPTIVE_SCHEDULING = False
+ADAPTIVE_MARGIN_PCT = 5.0      # Marge au-dessus du seuil consideree comme "proche"
+ADAPTIVE_MIN_HOURS = 1.0       # Intervalle minimal (proche du seuil)
+ADAPTIVE_MAX_HOURS = 48.0      # Intervalle maximal (article stable)
+ADAPTIVE_STABLE_DAYS = 2.0     # Sans changement depuis ce delai: intervalle double
+ADAPTIVE_WINDOW = 6            # Nombre de releves pris en compte pour la volatilite
 CONFIG_FILE = "tracked_products.json"
+BASE_URL = os.environ.get('GROSRAT_BASE_URL', "https://www.toppreise.ch")
+JOURNAL_COMPACT_BYTES = 64 * 1024   # Taille du journal declenchant la compaction
 VERSION = "2.2"
 
+# Verifications concurrentes
+MAX_WORKERS = 8             # Nombre max de produits verifies en parallele
+RATE_LIMIT_PER_HOST = 2.0   # Requetes/seconde max par hote (0 = illimite)
+
+# Session HTTP partagee
+HTTP_POOL_SIZE = 16         # Connexions keep-alive max par hote
+HTTP_RETRIES = 3            # Nouvelles tentatives sur erreur reseau / 429 / 5xx
+HTTP_BACKOFF = 0.5          # Facteur de backoff exponentiel (secondes)
+HTTP_TIMEOUT = 15
+
+# Cache des pages produit (requetes conditionnelles)
+CACHE_FILE = "http_cache.json"
+CACHE_MAX_ENTRIES = 2000    # Eviction LRU au-dela
+CACHE_TTL_HOURS = 48        # Rechargement complet force apres ce delai
+CACHE_SAVE_CHANGES = 200    # Le cache est reecrit apres ce nombre de modifications...
+CACHE_SAVE_SECONDS = 300    # ... ou ce delai depuis la derniere ecriture (et a l'arret)
+
+# Parseur HTML: 'auto', 'selectolax', 'lxml' ou 'html.parser'
+PARSER_BACKEND = 'auto'
+PARSE_WORKERS = 0           # Processus de parsing (0 = dans le processus principal)
+
+# Notifications Discord
+DISCORD_MAX_EMBEDS = 10     # Limite Discord d'embeds par message
+DISCORD_RETRIES = 5         # Tentatives par message (429, 5xx, erreur reseau)
+
+# Anti-doublons des alertes
+ALERT_STATE_FILE = "alert_state.json"
+ALERT_HYSTERESIS_PCT = 2.0  # Re-armement quand le prix repasse au-dessus du seuil + marge
+ALERT_REDROP_PCT = 5.0      # Nouvelle alerte si le prix baisse encore de X% depuis la derniere
+
+# Metriques: port de l'endpoint Prometheus (0 = desactive), fichier JSON
+METRICS_PORT = 0
+METRICS_DUMP = None
+
+# Repartition entre plusieurs noeuds (--shard-db): baux en SQLite partage
+SHARD_DB = None             # None = noeud unique, verifie tous les articles
+LEASE_SECONDS = 300         # Duree d'un bail, renouvele pendant la verification
+LEASE_CLOCK_SLACK = 30      # Tolerance de decalage d'horloge entre noeuds (s)
+
+# Flux d'evenements JSONL (--events): rotation par taille, gzip optionnel
+EVENTS_FILE = None
+EVENTS_MAX_BYTES = 10 * 1024 * 1024
+EVENTS_BACKUPS = 5          # Segments conserves apres rotation
+EVENTS_GZIP = False
+
+# Profilage d'un cycle (--profile-cycle, SIGUSR1): dossier des rapports
+PROFILE_DIR = "profiles"
+PROFILE_TOP = 30   # Lignes des rapports (fonctions, allocations)
+
+# Historique des prix (SQLite)
+HISTORY_DB = "price_history.db"
+
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
     'Accept-Language': 'fr-CH,fr;q=0.9,de;q=0.8',
@@ -37,6 +161,10 @@ HEADERS = {
 }
 
 
+log = logging.getLogger('grosrat')
+log.addHandler(logging.NullHandler())   # Silencieux tant que setup_logging n'est pas appele
+
+
 # =============================================================================
 # UTILITAIRES
 # =============================================================================
@@ -142,33 +270,120 @@ def interactive_menu(title, options, box_color=None):
             return options[-1][0]  # Derniere option par defaut
 
 
+# Reveil des attentes (signal, arret, nouvelle echeance): un self-pipe sous
+# Unix, surveille par select(); un Event sous Windows (pas de select sur la console)
+WAKE = threading.Event()
+if not HAS_MSVCRT:
+    _WAKE_R, _WAKE_W = os.pipe()
+    os.set_blocking(_WAKE_R, False)
+    os.set_blocking(_WAKE_W, False)
+
+
+def wake_up():
+    """
+    Interrompt l'attente en cours (appelable depuis un signal ou un thread).
+    Sous Unix, une simple ecriture dans le self-pipe: sure dans un gestionnaire
+    de signal, contrairement a Event.set() dont le verrou n'est pas reentrant.
+    """
+    if HAS_MSVCRT:
+        WAKE.set()
+        return
+    try:
+        os.write(_WAKE_W, b'\0')
+    except BlockingIOError:
+        pass  # Pipe plein: un reveil est deja en attente
+
+
+def _consume_wakeup():
+    WAKE.clear()
+    if not HAS_MSVCRT:
+        try:
+            while os.read(_WAKE_R, 512):
+                pass
+        except BlockingIOError:
+            pass
+
+
+def wait_for_wakeup(seconds):
+    """Attend 'seconds' secondes ou jusqu'a wake_up(). Retourne True si reveille."""
+    if HAS_MSVCRT:
+        woke = WAKE.wait(max(0, seconds))
+    else:
+        woke = bool(select.select([_WAKE_R], [], [], max(0, seconds))[0])
+    _consume_wakeup()
+    return woke
+
+
 def wait_with_keycheck(seconds):
     """
-    Attend pendant 'seconds' secondes, mais verifie regulierement 
-    si la touche Entree est pressee pour retourner au menu.
+    Attend pendant 'seconds' secondes sans reveil periodique: le processus
+    dort jusqu'a l'appui sur Entree, un wake_up() ou la fin du delai.
     Retourne True si Entree est presse, False sinon.
     """
-    end_time = time.time() + seconds
+    end_time = time.monotonic() + seconds
     
-    while time.time() < end_time:
-        # Verifier si une touche est pressee
-        if HAS_MSVCRT:
-            # Windows
+    if HAS_MSVCRT:
+        # La console Windows ne se prete pas a select(): verification de
+        # la touche a chaque demi-seconde, l'Event permet le reveil immediat
+        while time.monotonic() < end_time:
             if msvcrt.kbhit():
                 key = msvcrt.getch()
                 if key == b'\r':  # Touche Entree
                     return True
-        else:
-            # Unix - utilise select pour verifier stdin
-            if select.select([sys.stdin], [], [], 0)[0]:
-                key = sys.stdin.read(1)
-                if key == '\r' or key == '\n':  # Touche Entree
-                    return True
-        
-        # Petite pause pour ne pas surcharger le CPU
-        time.sleep(0.5)
+            if WAKE.wait(min(0.5, max(0, end_time - time.monotonic()))):
+                _consume_wakeup()
+                return False
+        return False
     
-    return False
+    # Unix - select bloquant sur stdin et le pipe de reveil
+    watched = [_WAKE_R]
+    if sys.stdin and not sys.stdin.closed:
+        watched.append(sys.stdin)
+    
+    while True:
+        remaining = end_time - time.monotonic()
+        if remaining <= 0:
+            return False
+        ready = select.select(watched, [], [], remaining)[0]
+        if _WAKE_R in ready:
+            _consume_wakeup()
+            return False
+        if sys.stdin in ready:
+            key = sys.stdin.read(1)
+            if key == '\r' or key == '\n':  # Touche Entree
+                return True
+            if key == '':
+                # stdin ferme: ne plus le surveiller
+                watched.remove(sys.stdin)
+
+
+def atomic_write_json(path, data, indent=None):
+    """
+    Ecrit 'data' en JSON de facon atomique: fichier temporaire dans le meme
+    dossier, fsync, puis rename. Un crash laisse l'ancien fichier intact.
+    """
+    folder = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=folder)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    
+    # Rendre le rename durable (pas de fsync de dossier sous Windows)
+    if os.name != 'nt':
+        dfd = os.open(folder, os.O_RDONLY)
+        try:
+            os.fsync(dfd)
+        finally:
+            os.close(dfd)
 
 
 # =============================================================================
@@ -207,13 +422,22 @@ class UI:
     
     W = 78  # Largeur
     
-    @staticmethod
-    def clear():
-        os.system('cls' if os.name == 'nt' else 'clear')
+    # Mode sans terminal (daemon): messages vers logging, pas d'effacement
+    headless = False
     
-    @staticmethod
-    def title(t):
+    @classmethod
+    def clear(cls):
+        if cls.headless:
+            return
         if os.name == 'nt':
+            os.system('cls')
+        else:
+            sys.stdout.write('\033[H\033[2J')
+            sys.stdout.flush()
+    
+    @classmethod
+    def title(cls, t):
+        if os.name == 'nt' and not cls.headless:
             os.system(f'title {t}')
     
     @classmethod
@@ -273,18 +497,30 @@ class UI:
     
     @classmethod
     def ok(cls, msg):
+        if cls.headless:
+            log.info(msg)
+            return
         print(f"  {C.BGRN}[OK]{C.RST} {msg}")
     
     @classmethod
     def err(cls, msg):
+        if cls.headless:
+            log.error(msg)
+            return
         print(f"  {C.BRED}[ERREUR]{C.RST} {msg}")
     
     @classmethod
     def warn(cls, msg):
+        if cls.headless:
+            log.warning(msg)
+            return
         print(f"  {C.BYLW}[!]{C.RST} {msg}")
     
     @classmethod
     def status(cls, msg):
+        if cls.headless:
+            log.info(msg)
+            return
         print(f"  {C.BBLU}[*]{C.RST} {msg}")
     
     @classmethod
@@ -359,7 +595,7 @@ class UI:
         if product.get('offers'):
             headers = ['Rang', 'Vendeur', 'Prix']
             rows = []
-            for i, offer in enumerate(product['offers'], 1):
+            for i, offer in enumerate(product['offers'][:5], 1):
                 rows.append([f"#{i}", offer['shop'], f"CHF {offer['price']:.2f}"])
             
             cls.table(headers, rows, [8, 40, 18])
@@ -425,211 +661,2362 @@ class UI:
 
 
 # =============================================================================
-# FONCTIONS SCRAPING
+# METRIQUES
 # =============================================================================
 
-def search_product(query):
-    """Recherche un produit sur Toppreise.ch"""
-    url = f"https://www.toppreise.ch/produktsuche?q={requests.utils.quote(query)}"
+class Metrics:
+    """
+    Compteurs et histogrammes de latence du pipeline de verification,
+    exportables au format texte Prometheus ou en JSON.
+    """
     
-    UI.status(f"Recherche de '{query}' sur Toppreise.ch...")
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
     
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=15)
-        resp.raise_for_status()
-        text = resp.text
+    def __init__(self, prefix='grosrat'):
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._histograms = {}   # nom -> {'buckets': [...], 'sum': s, 'count': n}
+        self._counters = {}     # (nom, labels) -> valeur
+    
+    def observe(self, name, seconds):
+        """Ajoute une duree (secondes) a l'histogramme 'name'"""
+        with self._lock:
+            h = self._histograms.get(name)
+            if h is None:
+                h = self._histograms[name] = {'buckets': [0] * len(self.BUCKETS), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.BUCKETS):
+                if seconds <= bound:
+                    h['buckets'][i] += 1
+            h['sum'] += seconds
+            h['count'] += 1
+    
+    def inc(self, name, value=1, **labels):
+        """Incremente le compteur 'name' pour ces labels"""
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+    
+    @contextmanager
+    def timer(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - t0)
+    
+    def snapshot(self):
+        """Etat courant en dict serialisable JSON"""
+        with self._lock:
+            counters = {}
+            for (name, labels), value in self._counters.items():
+                counters.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+            histograms = {
+                name: {
+                    'buckets': dict(zip([str(b) for b in self.BUCKETS], h['buckets'])),
+                    'sum': round(h['sum'], 6),
+                    'count': h['count'],
+                }
+                for name, h in self._histograms.items()
+            }
+        return {'ts': time.time(), 'counters': counters, 'histograms': histograms}
+    
+    def prometheus(self):
+        """Etat courant au format d'exposition texte Prometheus"""
+        lines = []
+        snap = self.snapshot()
+        for name, series in sorted(snap['counters'].items()):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            for serie in series:
+                labels = ','.join(f'{k}="{v}"' for k, v in serie['labels'].items())
+                lines.append(f"{metric}{{{labels}}} {serie['value']}" if labels else f"{metric} {serie['value']}")
+        for name, h in sorted(snap['histograms'].items()):
+            metric = f"{self.prefix}_{name}"
+            lines.append(f"# TYPE {metric} histogram")
+            for bound, count in h['buckets'].items():
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {count}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {h["count"]}')
+            lines.append(f"{metric}_sum {h['sum']}")
+            lines.append(f"{metric}_count {h['count']}")
+        return '\n'.join(lines) + '\n'
+    
+    def dump(self, path):
+        """Ecrit l'etat courant en JSON"""
+        atomic_write_json(path, self.snapshot(), indent=2)
+
+
+METRICS = Metrics()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics (texte Prometheus) et /metrics.json"""
+    
+    def do_GET(self):
+        if self.path.split('?')[0] == '/metrics':
+            body = METRICS.prometheus().encode('utf-8')
+            ctype = 'text/plain; version=0.0.4; charset=utf-8'
+        elif self.path.split('?')[0] == '/metrics.json':
+            body = json.dumps(METRICS.snapshot()).encode('utf-8')
+            ctype = 'application/json'
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+
+def start_metrics_server(port, host='127.0.0.1'):
+    """Demarre l'endpoint de metriques dans un thread, retourne le serveur"""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='grosrat-metrics', daemon=True).start()
+    return server
+
+
+def record_response(kind, resp, seconds):
+    """
+    Metriques d'une reponse HTTP: statut, octets, temps d'en-tetes / de telechargement.
+    'seconds' (mesure par l'appelant) n'est utilise que si la reponse ne porte pas
+    sa propre duree de requete, hors attente du limiteur. Retourne la duree retenue.
+    """
+    seconds = getattr(resp, 'request_seconds', seconds)
+    METRICS.inc('http_responses_total', kind=kind, status=resp.status_code)
+    METRICS.observe(f'{kind}_fetch_seconds', seconds)
+    if resp.status_code == 200:
+        METRICS.inc('downloaded_bytes_total', len(resp.content), kind=kind)
+    elapsed = getattr(resp, 'elapsed', None)
+    if elapsed is not None:
+        # elapsed: envoi -> en-tetes recus (DNS, connexion, TLS, attente serveur)
+        ttfb = elapsed.total_seconds()
+        METRICS.observe(f'{kind}_ttfb_seconds', ttfb)
+        METRICS.observe(f'{kind}_download_seconds', max(0.0, seconds - ttfb))
+    return seconds
+
+
+# =============================================================================
+# FLUX D'EVENEMENTS
+# =============================================================================
+
+class EventLog:
+    """
+    Flux JSONL en ajout seul des evenements de suivi (check_started, fetched,
+    parsed, price_changed, alert_sent, error), une ligne par evenement.
+    L'ecriture et la rotation sont faites par un thread dedie: emit() ne fait
+    que mettre en file. Sans fichier configure, emit() ne fait rien.
+    """
+    
+    def __init__(self, path=EVENTS_FILE, max_bytes=EVENTS_MAX_BYTES,
+                 backups=EVENTS_BACKUPS, compress=EVENTS_GZIP):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = max(1, backups)
+        self.compress = compress
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self._last_price = {}       # id produit -> dernier meilleur prix (price_changed)
+    
+    @property
+    def enabled(self):
+        return self.path is not None
+    
+    def emit(self, event, **fields):
+        if self.path is None:
+            return
+        line = {'ts': datetime.now().isoformat(timespec='milliseconds'), 'event': event}
+        line.update(fields)
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='grosrat-events', daemon=True)
+                    self._thread.start()
+        self._queue.put(json.dumps(line, ensure_ascii=False) + '\n')
+    
+    def price(self, url, price, entry_ids=None):
+        """Emet price_changed si le meilleur prix du produit a change depuis le dernier releve"""
+        if self.path is None or not price:
+            return
+        pid = product_id_from_url(url)
+        with self._lock:
+            if pid not in self._last_price:
+                recent = HISTORY.recent(pid, 1)
+                self._last_price[pid] = recent[0][1] if recent else None
+            previous, self._last_price[pid] = self._last_price[pid], price
+        if previous is not None and previous != price:
+            self.emit('price_changed', url=url, product_id=pid, entry_ids=entry_ids,
+                      old=previous, new=price, delta=round(price - previous, 2))
+    
+    def _open(self):
+        self._file = open(self.path, 'a', encoding='utf-8', buffering=1)
+    
+    def _rotate(self):
+        """events.jsonl -> events.jsonl.1[.gz] -> ... -> events.jsonl.N[.gz]"""
+        self._file.close()
+        ext = '.gz' if self.compress else ''
+        for i in range(self.backups - 1, 0, -1):
+            src = f"{self.path}.{i}{ext}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}{ext}")
+        if self.compress:
+            with open(self.path, 'rb') as src, gzip.open(f"{self.path}.1.gz", 'wb') as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(self.path)
+        else:
+            os.replace(self.path, f"{self.path}.1")
+        self._open()
+    
+    def _run(self):
+        while True:
+            line = self._queue.get()
+            if line is None:
+                break
+            try:
+                if self._file is None:
+                    self._open()
+                self._file.write(line)
+                if self._file.tell() >= self.max_bytes:
+                    self._rotate()
+            except OSError as e:
+                UI.warn(f"Flux d'evenements: {e}")
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def close(self, timeout=10):
+        """Ecrit les evenements en attente puis arrete le thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None and thread.is_alive():
+            self._queue.put(None)
+            thread.join(timeout)
+
+
+EVENTS = EventLog()
+atexit.register(EVENTS.close)
+
+
+# =============================================================================
+# PROFILAGE
+# =============================================================================
+
+# Python 3.12+: cProfile passe par sys.monitoring, global a l'interpreteur. Un
+# seul profileur peut etre actif (un second leve ValueError) et il voit deja les
+# appels de tous les threads: inutile d'en creer un par thread du pool.
+PROFILE_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+class CycleProfiler:
+    """
+    Profile le prochain cycle de verification sur demande (cProfile + tracemalloc).
+    Desarme, cycle() et wrap() ne font qu'un test de booleen.
+    """
+    
+    def __init__(self, folder=PROFILE_DIR, top=PROFILE_TOP):
+        self.folder = folder
+        self.top = top
+        self.requested = False
+        self._profiles = None    # Profils des threads du cycle en cours
+        self._lock = threading.Lock()
+    
+    def request(self):
+        """Arme le profilage du prochain cycle (sur a appeler depuis un signal)"""
+        self.requested = True
+    
+    @property
+    def active(self):
+        return self._profiles is not None
+    
+    def wrap(self, fn):
+        """Fonction executee dans un thread du pool: profilee si un cycle l'est"""
+        if self._profiles is None or PROFILE_ALL_THREADS:
+            return fn
+        
+        def profiled(*args, **kwargs):
+            prof = cProfile.Profile()
+            try:
+                prof.enable()
+            except ValueError:
+                # Un autre outil de profilage est actif: verification non profilee
+                return fn(*args, **kwargs)
+            with self._lock:
+                if self._profiles is not None:
+                    self._profiles.append(prof)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                prof.disable()
+        return profiled
+    
+    @contextmanager
+    def cycle(self, label='cycle'):
+        if not self.requested:
+            yield
+            return
+        
+        self.requested = False
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError as e:
+            log.warning("Profilage du cycle impossible: %s", e)
+            yield
+            return
+        self._profiles = [prof]
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start(25)
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            prof.disable()
+            elapsed = time.perf_counter() - t0
+            snapshot = tracemalloc.take_snapshot()
+            if started_tracing:
+                tracemalloc.stop()
+            with self._lock:
+                profiles, self._profiles = self._profiles, None
+            try:
+                self._write(label, profiles, snapshot, elapsed)
+            except OSError as e:
+                UI.err(f"Rapport de profilage impossible: {e}")
+    
+    def _write(self, label, profiles, snapshot, elapsed):
+        """Ecrit <label>-<date>.pstats et le rapport texte associe"""
+        os.makedirs(self.folder, exist_ok=True)
+        base = os.path.join(self.folder, f"{label}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
         
-        products = []
-        seen = set()
+        out = io.StringIO()
+        stats = pstats.Stats(profiles[0], stream=out)
+        for prof in profiles[1:]:
+            stats.add(prof)
+        stats.dump_stats(base + '.pstats')
         
-        # Pattern pour extraire les produits depuis les URLs
-        # Format: /preisvergleich/Category/Product-Name-p123456
-        pattern = r'/preisvergleich/[^/]+/([^"\?]+)-p(\d+)'
-        matches = re.findall(pattern, text)
+        out.write(f"Cycle '{label}': {elapsed:.3f}s, {len(profiles)} profil(s) fusionne(s)\n\n")
+        out.write("== Fonctions (temps cumule, tous threads) ==\n")
+        stats.sort_stats('cumulative').print_stats(self.top)
         
-        for name_raw, pid in matches:
-            if pid not in seen:
-                seen.add(pid)
-                
-                # Nettoyer le nom (remplacer - par espace)
-                name = name_raw.replace('-', ' ')
-                
-                # Filtrer les noms trop courts ou invalides
-                if len(name) > 10 and 'CHF' not in name:
-                    # Reconstruire l'URL
-                    href = f"/preisvergleich/Grafikkarten/{name_raw}-p{pid}"
-                    # Chercher la vraie URL dans le texte
-                    url_match = re.search(rf'/preisvergleich/[^"\s]+{pid}[^"\s]*', text)
-                    if url_match:
-                        href = url_match.group(0).split('"')[0].split(')')[0]
-                    
-                    products.append({
-                        'id': pid,
-                        'name': name[:100],
-                        'url': f"https://www.toppreise.ch{href}" if href.startswith('/') else href,
-                    })
-                    
-                    if len(products) >= 10:
-                        break
-        
-        return products
+        snapshot = snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ))
+        out.write("== Allocations encore en memoire (par ligne) ==\n")
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            out.write(f"{stat}\n")
+        with open(base + '.txt', 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
         
-    except Exception as e:
-        UI.err(f"Erreur de recherche: {e}")
-        return []
+        UI.ok(f"Profil du cycle ecrit: {base}.pstats / .txt")
 
 
-def get_product_details(url, silent=False):
-    """Recupere les details d'un produit"""
-    if not silent:
-        UI.status("Chargement des details...")
+PROFILER = CycleProfiler()
+
+
+# =============================================================================
+# LIMITATION DE DEBIT
+# =============================================================================
+
+class RateLimiter:
+    """
+    Limite le debit de requetes par hote.
+    Chaque appel a wait() reserve le prochain creneau libre pour l'hote,
+    les threads concurrents sont donc espaces d'au moins 1/rate secondes.
+    """
     
-    try:
-        resp = requests.get(url, headers=HEADERS, timeout=15)
-        resp.raise_for_status()
-        text = resp.text
-        soup = BeautifulSoup(text, 'html.parser')
-        
-        # Titre depuis h1
-        title = ""
-        h1 = soup.find('h1')
-        if h1:
-            title = h1.get_text(strip=True)
-        
-        # Reference (entre parentheses a la fin)
-        reference = ""
-        ref_m = re.search(r'\(([^)]+)\)\s*$', title)
-        if ref_m:
-            reference = ref_m.group(1)
-        
-        # Extraction des offres avec BeautifulSoup
-        offers = []
-        seen = set()
-        
-        # Trouver tous les logos de shops
-        shop_logos = soup.select('.Plugin_ShopLogo')
-        
-        for logo in shop_logos:
-            # Trouver le nom du shop depuis l'image
-            img = logo.find('img')
-            if not img:
-                continue
-            shop_name = img.get('alt') or img.get('title') or ''
-            shop_name = shop_name.strip()
-            
-            if not shop_name or shop_name in seen:
-                continue
-            
-            # Remonter pour trouver le conteneur de l'offre
-            # Le prix est dans un frere/parent avec class priceContainer
-            parent = logo
-            price_found = None
-            
-            # Chercher dans les parents/freres
-            for _ in range(10):
-                parent = parent.parent
-                if not parent:
-                    break
-                
-                # Chercher le prix dans ce conteneur
-                price_div = parent.select_one('.Plugin_Price')
-                if price_div:
-                    price_text = price_div.get_text(strip=True)
-                    price_clean = price_text.replace("'", "").replace(",", ".").strip()
-                    try:
-                        price_found = float(price_clean)
-                        break
-                    except ValueError:
-                        pass
-            
-            if price_found and shop_name not in seen:
-                seen.add(shop_name)
-                offers.append({
-                    'shop': shop_name,
-                    'price': price_found,
-                })
-        
-        # Trier par prix
-        offers.sort(key=lambda x: x['price'])
-        
-        # Meilleur prix depuis "X Angebote ab CHF Y"
-        best = None
-        m = re.search(r'(\d+)\s*Angebote?\s*ab\s*CHF\s*([\d\'\.,]+)', text)
-        if m:
-            try:
-                best = float(m.group(2).replace("'", "").replace(",", "."))
-            except:
-                pass
-        
-        # Fallback sur la premiere offre
-        if not best and offers:
-            best = offers[0]['price']
-        
-        return {
-            'title': title,
-            'reference': reference,
-            'url': url,
-            'best_price': best,
-            'offers': offers[:5],
-            'total_offers': len(offers)
-        }
+    def __init__(self, rate=RATE_LIMIT_PER_HOST):
+        self.set_rate(rate)
+        self._next = {}
+        self._lock = threading.Lock()
+    
+    def set_rate(self, rate):
+        """Requetes/seconde max par hote (0 = illimite)"""
+        self.interval = 1.0 / rate if rate else 0.0
+    
+    def wait(self, url):
+        """Bloque jusqu'au prochain creneau disponible pour l'hote de 'url', retourne l'attente"""
+        if not self.interval:
+            return 0.0
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+            return delay
+        return 0.0
+
+
+RATE_LIMITER = RateLimiter()
+
+
+# =============================================================================
+# SESSION HTTP
+# =============================================================================
+
+class HttpClient:
+    """
+    Session HTTP partagee par le scraping et Discord.
+    Garde les connexions ouvertes (keep-alive) dans un pool, relance les
+    requetes GET en echec avec backoff et negocie gzip/brotli.
+    """
+    
+    def __init__(self, pool_size=HTTP_POOL_SIZE, retries=HTTP_RETRIES,
+                 backoff=HTTP_BACKOFF, rate_limiter=RATE_LIMITER):
+        self.rate_limiter = rate_limiter
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate, br' if HAS_BROTLI else 'gzip, deflate'
         
-    except Exception as e:
-        UI.err(f"Erreur de chargement: {e}")
-        return None
+        # Les POST (Discord) ne sont pas relances ici: pas idempotents
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET', 'HEAD']),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+    
+    def get(self, url, timeout=HTTP_TIMEOUT, **kwargs):
+        """
+        GET limite en debit par hote. L'attente du limiteur est mesuree a part
+        (rate_limit_wait_seconds); resp.request_seconds ne couvre que la requete.
+        """
+        if self.rate_limiter:
+            METRICS.observe('rate_limit_wait_seconds', self.rate_limiter.wait(url))
+        t0 = time.perf_counter()
+        resp = self.session.get(url, timeout=timeout, **kwargs)
+        resp.request_seconds = time.perf_counter() - t0
+        return resp
+    
+    def post(self, url, timeout=10, **kwargs):
+        return self.session.post(url, timeout=timeout, **kwargs)
+    
+    def close(self):
+        self.session.close()
+
+
+HTTP = HttpClient()
+
+
+# =============================================================================
+# SOURCES DES PAGES
+# =============================================================================
+
+class Fetcher(abc.ABC):
+    """
+    Source des pages scrapees. get() retourne un objet reponse avec
+    status_code, text, headers et raise_for_status(), comme requests.
+    Une source sans get() echoue des sa creation (TypeError).
+    """
+    
+    @abc.abstractmethod
+    def get(self, url, headers=None):
+        """Reponse pour 'url' (en-tetes HTTP optionnels)"""
+
+
+class LiveFetcher(Fetcher):
+    """Pages telechargees via la session HTTP partagee"""
+    
+    def __init__(self, http=None):
+        self.http = http
+    
+    def get(self, url, headers=None):
+        return (self.http or HTTP).get(url, headers=headers)
+
+
+class StoredResponse:
+    """Reponse rejouee depuis le disque ou la memoire"""
+    
+    def __init__(self, url, status_code, text, headers=None):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.content = text.encode('utf-8')
+        self.headers = requests.structures.CaseInsensitiveDict(headers or {})
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} pour {self.url}")
+
+
+def cassette_key(url):
+    """Nom de cassette d'une URL: chemin + requete, independant de l'hote"""
+    parts = urlsplit(url)
+    target = parts.path + ('?' + parts.query if parts.query else '')
+    return hashlib.sha1(target.encode('utf-8')).hexdigest()[:20]
+
+
+class RecordingFetcher(Fetcher):
+    """Delegue a un autre fetcher et enregistre chaque page 200 dans 'folder'"""
+    
+    def __init__(self, folder, inner=None):
+        self.folder = folder
+        self.inner = inner or LiveFetcher()
+        os.makedirs(folder, exist_ok=True)
+    
+    def get(self, url, headers=None):
+        resp = self.inner.get(url, headers=headers)
+        if resp.status_code == 200:
+            atomic_write_json(os.path.join(self.folder, cassette_key(url) + '.json'), {
+                'url': url,
+                'status': resp.status_code,
+                'headers': {k: v for k, v in resp.headers.items()
+                            if k.lower() in ('content-type', 'etag', 'last-modified')},
+                'text': resp.text,
+            })
+        return resp
+
+
+class ReplayFetcher(Fetcher):
+    """Rejoue les pages enregistrees par RecordingFetcher (404 si absente)"""
+    
+    def __init__(self, folder):
+        self.folder = folder
+    
+    def get(self, url, headers=None):
+        path = os.path.join(self.folder, cassette_key(url) + '.json')
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                rec = json.load(f)
+        except FileNotFoundError:
+            return StoredResponse(url, 404, "")
+        return StoredResponse(url, rec['status'], rec['text'], rec.get('headers'))
+
+
+class MemoryFetcher(Fetcher):
+    """
+    Garde en memoire les pages d'un autre fetcher pendant 'ttl' secondes.
+    Utile pour les tests de charge: une page n'est telechargee qu'une fois.
+    """
+    
+    def __init__(self, inner=None, ttl=3600):
+        self.inner = inner or LiveFetcher()
+        self.ttl = ttl
+        self._pages = {}
+        self._lock = threading.Lock()
+    
+    def get(self, url, headers=None):
+        with self._lock:
+            hit = self._pages.get(url)
+        if hit and time.monotonic() - hit[0] < self.ttl:
+            return hit[1]
+        resp = self.inner.get(url, headers=headers)
+        if resp.status_code == 200:
+            stored = StoredResponse(url, 200, resp.text, dict(resp.headers))
+            with self._lock:
+                self._pages[url] = (time.monotonic(), stored)
+        return resp
+
+
+def make_fetcher(mode='live', cassettes=None):
+    """Fetcher pour un mode: 'live', 'record', 'replay' ou 'memory'"""
+    if mode == 'record':
+        return RecordingFetcher(cassettes or 'cassettes')
+    if mode == 'replay':
+        return ReplayFetcher(cassettes or 'cassettes')
+    if mode == 'memory':
+        return MemoryFetcher()
+    return LiveFetcher()
+
+
+FETCHER = LiveFetcher()
+
+
+# =============================================================================
+# MODELE DE DONNEES
+# =============================================================================
+# Representation compacte (slots) des articles suivis et des offres, pour le
+# suivi de longue duree. Le format JSON de tracked_products.json reste la
+# reference: from_dict / to_dict sont sans perte (cles inconnues et valeurs
+# nulles conservees dans 'extra'). La lecture facon dict (obj['cle'],
+# obj.get('cle')) permet de partager les fonctions avec l'interface.
+
+class _Record:
+    """
+    Lecture facon dict du JSON d'origine: une cle absente leve KeyError
+    (get: defaut), une cle presente a null vaut None (conservee dans extra).
+    """
+    __slots__ = ()
+    _KEYS = ()
+    
+    def __getitem__(self, key):
+        if key in self._KEYS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+    
+    def __contains__(self, key):
+        if key in self._KEYS and getattr(self, key) is not None:
+            return True
+        return bool(self.extra) and key in self.extra
+    
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+    
+    @classmethod
+    def _split(cls, d):
+        """Cles connues non nulles d'un cote, le reste (a conserver tel quel) de l'autre"""
+        known = {k: v for k, v in d.items() if k in cls._KEYS and v is not None}
+        extra = {k: v for k, v in d.items() if k not in known}
+        return known, extra or None
+    
+    def to_dict(self):
+        d = {}
+        for k in self._KEYS:
+            value = getattr(self, k)
+            if value is not None:
+                d[k] = value.to_dict() if isinstance(value, _Record) else value
+        if self.extra:
+            d.update(self.extra)
+        return d
+
+
+@dataclass(slots=True, eq=True)
+class Offer(_Record):
+    """Offre d'un shop (nom interne: partage entre tous les produits)"""
+    shop: str
+    price: float
+    extra: dict = None
+    
+    _KEYS = ('shop', 'price')
+    
+    @classmethod
+    def from_dict(cls, d):
+        known, extra = cls._split(d)
+        return cls(sys.intern(known.get('shop', '')), known.get('price'), extra)
+
+
+@dataclass(slots=True, eq=True)
+class Product(_Record):
+    title: str = None
+    reference: str = None
+    url: str = None
+    best_price: float = None
+    extra: dict = None
+    
+    _KEYS = ('title', 'reference', 'url', 'best_price')
+    
+    @classmethod
+    def from_dict(cls, d):
+        known, extra = cls._split(d)
+        return cls(extra=extra, **known)
+
+
+@dataclass(slots=True, eq=True)
+class TrackedEntry(_Record):
+    """Article suivi; None = cle absente du JSON (active absent = actif)"""
+    id: int = None
+    product: Product = None
+    threshold: float = None
+    active: bool = None
+    created: str = None
+    interval_hours: float = None
+    window: str = None
+    extra: dict = None
+    
+    _KEYS = ('id', 'product', 'threshold', 'active', 'created', 'interval_hours', 'window')
+    
+    @classmethod
+    def from_dict(cls, d):
+        known, extra = cls._split(d)
+        if isinstance(known.get('product'), dict):
+            known['product'] = Product.from_dict(known['product'])
+        return cls(extra=extra, **known)
+    
+    @property
+    def is_active(self):
+        return self.active is None or bool(self.active)
+    
+    @property
+    def url(self):
+        return self.product.url
+
+
+def compact_offers(offers):
+    """Liste d'offres (dicts ou Offer) en Offer"""
+    return [o if isinstance(o, Offer) else Offer.from_dict(o) for o in offers]
+
+
+# =============================================================================
+# CACHE HTTP
+# =============================================================================
+
+class ResponseCache:
+    """
+    Cache disque des pages produit, indexe par URL.
+    Conserve les validateurs HTTP (ETag / Last-Modified) et le dernier
+    resultat parse. Eviction LRU au-dela de max_entries, expiration apres ttl.
+    Le fichier complet n'est reecrit que toutes les CACHE_SAVE_CHANGES
+    modifications ou CACHE_SAVE_SECONDS secondes: perdre les dernieres
+    entrees (arret brutal) ne coute qu'un telechargement complet.
+    """
+    
+    def __init__(self, path=CACHE_FILE, max_entries=CACHE_MAX_ENTRIES, ttl_hours=CACHE_TTL_HOURS):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl_hours * 3600
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._changes = 0                       # Modifications non ecrites
+        self._saved_at = time.monotonic()
+    
+    def _load(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Le fichier est ecrit du moins au plus recemment utilise
+            for url, entry in data.get('entries', []):
+                entry['result']['offers'] = compact_offers(entry['result'].get('offers', []))
+                self._entries[url] = entry
+        except (OSError, ValueError):
+            self._entries.clear()
+    
+    def get(self, url):
+        """Retourne l'entree en cache pour 'url' ou None (absente ou expiree)"""
+        with self._lock:
+            self._load()
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+            if time.time() - entry['stored'] > self.ttl:
+                del self._entries[url]
+                self._changes += 1
+                return None
+            self._entries.move_to_end(url)
+            return entry
+    
+    @staticmethod
+    def validators(entry):
+        """En-tetes de requete conditionnelle pour une entree du cache"""
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+    
+    def put(self, url, resp_headers, result):
+        """Memorise le resultat parse si la reponse porte des validateurs"""
+        etag = resp_headers.get('ETag')
+        last_modified = resp_headers.get('Last-Modified')
+        with self._lock:
+            self._load()
+            if not etag and not last_modified:
+                if self._entries.pop(url, None) is not None:
+                    self._changes += 1
+                return
+            self._entries[url] = {
+                'etag': etag,
+                'last_modified': last_modified,
+                'stored': time.time(),
+                'result': {**result, 'offers': compact_offers(result.get('offers', []))},
+            }
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._changes += 1
+    
+    def save(self, force=False):
+        """Ecrit le cache sur disque s'il a assez change (ou s'il a change, avec force)"""
+        with self._lock:
+            if not self._changes or not self.path:
+                return
+            if (not force and self._changes < CACHE_SAVE_CHANGES
+                    and time.monotonic() - self._saved_at < CACHE_SAVE_SECONDS):
+                return
+            data = {'entries': [
+                (url, {**entry, 'result': {**entry['result'],
+                                           'offers': [o.to_dict() for o in entry['result']['offers']]}})
+                for url, entry in self._entries.items()
+            ]}
+            self._changes = 0
+            self._saved_at = time.monotonic()
+        try:
+            atomic_write_json(self.path, data)
+        except OSError as e:
+            UI.warn(f"Cache non sauvegarde: {e}")
+
+
+HTTP_CACHE = ResponseCache()
+atexit.register(lambda: HTTP_CACHE.save(force=True))
+
+
+# =============================================================================
+# PARSING
+# =============================================================================
+
+class ParserBackend(abc.ABC):
+    """
+    Interface minimale d'un parseur HTML pour l'extraction des offres.
+    Les noeuds sont opaques, seul le backend sait les manipuler.
+    Un backend incomplet echoue des sa creation (TypeError).
+    """
+    
+    name = None
+    
+    @abc.abstractmethod
+    def parse(self, html):
+        """Retourne la racine du document"""
+    
+    @abc.abstractmethod
+    def select(self, node, selector):
+        """Tous les descendants correspondant au selecteur CSS (ordre du document)"""
+    
+    @abc.abstractmethod
+    def first(self, node, selector):
+        """Premier descendant correspondant au selecteur CSS, ou None"""
+    
+    @abc.abstractmethod
+    def parent(self, node):
+        """Noeud parent, ou None"""
+    
+    @abc.abstractmethod
+    def text(self, node):
+        """Texte du noeud, espaces de bord supprimes"""
+    
+    @abc.abstractmethod
+    def attr(self, node, name):
+        """Valeur de l'attribut 'name', ou None"""
+    
+    @abc.abstractmethod
+    def key(self, node):
+        """Identifiant hashable et stable du noeud"""
+
+
+class SoupBackend(ParserBackend):
+    """BeautifulSoup, avec lxml ou html.parser comme moteur"""
+    
+    def __init__(self, features='html.parser'):
+        self.name = features
+    
+    def parse(self, html):
+        return BeautifulSoup(html, self.name)
+    
+    def select(self, node, selector):
+        return node.select(selector)
+    
+    def first(self, node, selector):
+        return node.select_one(selector)
+    
+    def parent(self, node):
+        return node.parent
+    
+    def text(self, node):
+        return node.get_text(strip=True)
+    
+    def attr(self, node, name):
+        return node.get(name)
+    
+    def key(self, node):
+        return id(node)
+
+
+class SelectolaxBackend(ParserBackend):
+    """selectolax (moteur lexbor, en C)"""
+    
+    name = 'selectolax'
+    
+    def parse(self, html):
+        return LexborHTMLParser(html)
+    
+    def select(self, node, selector):
+        return node.css(selector)
+    
+    def first(self, node, selector):
+        return node.css_first(selector)
+    
+    def parent(self, node):
+        return node.parent
+    
+    def text(self, node):
+        return node.text(strip=True)
+    
+    def attr(self, node, name):
+        return node.attributes.get(name)
+    
+    def key(self, node):
+        return node.mem_id
+
+
+def get_parser_backend(name=PARSER_BACKEND):
+    """Retourne le backend demande, ou le plus rapide disponible pour 'auto'"""
+    if name in ('auto', 'selectolax') and HAS_SELECTOLAX:
+        return SelectolaxBackend()
+    if name in ('auto', 'lxml') and HAS_LXML:
+        return SoupBackend('lxml')
+    return SoupBackend('html.parser')
+
+
+PARSER = get_parser_backend()
+
+_REFERENCE_RE = re.compile(r'\(([^)]+)\)\s*$')
+_BEST_PRICE_RE = re.compile(r'(\d+)\s*Angebote?\s*ab\s*CHF\s*([\d\'\.,]+)')
+
+
+def parse_chf(text):
+    """Convertit un prix affiche (1'019.50, 998,00) en float, None si invalide"""
+    try:
+        return float(text.replace("'", "").replace(",", ".").strip())
+    except ValueError:
+        return None
+
+
+def extract_product(html, backend=None):
+    """
+    Extrait les informations d'une page produit.
+    Retourne un dict {'title', 'reference', 'best_price', 'offers', 'total_offers'};
+    'offers' contient toutes les offres, triees par prix (l'affichage se limite aux 5 premieres).
+    """
+    backend = backend or PARSER
+    root = backend.parse(html)
+    
+    # Titre depuis h1
+    title = ""
+    h1 = backend.first(root, 'h1')
+    if h1 is not None:
+        title = backend.text(h1)
+    
+    # Reference (entre parentheses a la fin)
+    reference = ""
+    ref_m = _REFERENCE_RE.search(title)
+    if ref_m:
+        reference = ref_m.group(1)
+    
+    # Index ancetre -> premier .Plugin_Price qu'il contient (ordre du document).
+    # Chaque branche n'est remontee qu'une fois: on s'arrete au premier
+    # ancetre deja indexe, ses propres ancetres l'etant forcement aussi.
+    first_price = {}
+    for price_node in backend.select(root, '.Plugin_Price'):
+        node = backend.parent(price_node)
+        while node is not None:
+            k = backend.key(node)
+            if k in first_price:
+                break
+            first_price[k] = price_node
+            node = backend.parent(node)
+    
+    offers = []
+    seen = set()
+    prices = {}
+    
+    for logo in backend.select(root, '.Plugin_ShopLogo'):
+        # Nom du shop depuis l'image
+        img = backend.first(logo, 'img')
+        if img is None:
+            continue
+        shop_name = (backend.attr(img, 'alt') or backend.attr(img, 'title') or '').strip()
+        
+        if not shop_name or shop_name in seen:
+            continue
+        
+        # Premier conteneur parent (10 niveaux max) portant un prix valide
+        node = logo
+        price_found = None
+        for _ in range(10):
+            node = backend.parent(node)
+            if node is None:
+                break
+            price_node = first_price.get(backend.key(node))
+            if price_node is None:
+                continue
+            pk = backend.key(price_node)
+            if pk not in prices:
+                prices[pk] = parse_chf(backend.text(price_node))
+            price_found = prices[pk]
+            if price_found is not None:
+                break
+        
+        if price_found:
+            seen.add(shop_name)
+            offers.append({
+                'shop': shop_name,
+                'price': price_found,
+            })
+    
+    # Trier par prix
+    offers.sort(key=lambda x: x['price'])
+    
+    # Meilleur prix depuis "X Angebote ab CHF Y"
+    best = None
+    m = _BEST_PRICE_RE.search(html)
+    if m:
+        best = parse_chf(m.group(2))
+    
+    # Fallback sur la premiere offre
+    if not best and offers:
+        best = offers[0]['price']
+    
+    return {
+        'title': title,
+        'reference': reference,
+        'best_price': best,
+        'offers': offers,
+        'total_offers': len(offers)
+    }
+
+
+def _init_parse_worker(backend_name):
+    """Initialisation d'un processus de parsing: backend identique au parent"""
+    global PARSER
+    # Ctrl+C et arret sont geres par le processus principal
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    PARSER = get_parser_backend(backend_name)
+
+
+class ParsePool:
+    """
+    Parsing des pages produit dans un pool de processus (un coeur par page),
+    seul le resultat compact revient au processus principal.
+    Sans workers, ou si le pool est indisponible, le parsing reste local.
+    """
+    
+    def __init__(self, workers=0, backend_name=PARSER_BACKEND):
+        self.workers = workers
+        self.backend_name = backend_name
+        self._pool = None
+        self._lock = threading.Lock()
+    
+    def start(self):
+        """
+        Cree les processus des maintenant (fork avant le demarrage des threads
+        de verification). Retourne False si le parsing reste local.
+        """
+        if self.workers <= 0:
+            return False
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            # spawn reimporterait ce module et ses singletons (cache, historique)
+            UI.warn("Parsing multi-processus indisponible sur cette plateforme, parsing local")
+            self.workers = 0
+            return False
+        with self._lock:
+            if self._pool is None:
+                try:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('fork'),
+                        initializer=_init_parse_worker,
+                        initargs=(self.backend_name,),
+                    )
+                    # Premier envoi: lance tous les processus
+                    self._pool.submit(len, '').result()
+                except (OSError, BrokenProcessPool) as e:
+                    UI.warn(f"Pool de parsing indisponible ({e}), parsing local")
+                    self._pool = None
+                    self.workers = 0
+                    return False
+        return True
+    
+    def extract(self, html):
+        """extract_product(html), dans un processus du pool si possible"""
+        pool = self._pool
+        if pool is None:
+            return extract_product(html)
+        try:
+            return pool.submit(extract_product, html).result()
+        except BrokenProcessPool:
+            UI.warn("Pool de parsing interrompu, retour au parsing local")
+            self.close()
+            self.workers = 0
+            return extract_product(html)
+    
+    def close(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+PARSE_POOL = ParsePool(PARSE_WORKERS)
+atexit.register(PARSE_POOL.close)
+
+
+# =============================================================================
+# FONCTIONS SCRAPING
+# =============================================================================
+
+# Lien produit: /preisvergleich/Category/Product-Name-p123456
+_PRODUCT_LINK_RE = re.compile(r'/preisvergleich/[^/"\'\s?#()<>]+/([^/"\'\s?#()<>]+)-p(\d+)\b')
+
+
+def extract_search_results(text, limit=10, base_url=None):
+    """
+    Extrait les produits d'une page de resultats en un seul passage.
+    Le premier lien rencontre pour chaque id sert d'URL canonique.
+    """
+    base_url = (base_url or BASE_URL).rstrip('/')
+    products = []
+    seen = set()
+    
+    for m in _PRODUCT_LINK_RE.finditer(text):
+        name_raw, pid = m.group(1), m.group(2)
+        if pid in seen:
+            continue
+        seen.add(pid)
+        
+        # Nettoyer le nom (remplacer - par espace)
+        name = name_raw.replace('-', ' ')
+        
+        # Filtrer les noms trop courts ou invalides
+        if len(name) > 10 and 'CHF' not in name:
+            products.append({
+                'id': pid,
+                'name': name[:100],
+                'url': f"{base_url}{m.group(0)}",
+            })
+            
+            if len(products) >= limit:
+                break
+    
+    return products
+
+
+def site_url(url, base_url=None):
+    """
+    URL a interroger pour un lien produit enregistre: les fiches gardent leur
+    URL absolue d'origine, on la reporte sur BASE_URL (schema, hote et prefixe)
+    pour que --base-url s'applique aussi aux verifications.
+    """
+    base = urlsplit((base_url or BASE_URL).rstrip('/'))
+    parts = urlsplit(url)
+    path = parts.path
+    # Retirer un eventuel prefixe de l'ancien site (miroir sous un sous-chemin)
+    i = path.find('/preisvergleich/')
+    if i > 0:
+        path = path[i:]
+    if base.path and not path.startswith(base.path + '/'):
+        path = base.path + path
+    return urlunsplit((base.scheme, base.netloc, path, parts.query, ''))
+
+
+def search_product(query, silent=False):
+    """Recherche un produit sur Toppreise.ch"""
+    url = f"{BASE_URL.rstrip('/')}/produktsuche?q={quote(query)}"
+    
+    if not silent:
+        UI.status(f"Recherche de '{query}' sur Toppreise.ch...")
+    
+    try:
+        t0 = time.perf_counter()
+        resp = FETCHER.get(url)
+        record_response('search', resp, time.perf_counter() - t0)
+        resp.raise_for_status()
+        with METRICS.timer('search_parse_seconds'):
+            return extract_search_results(resp.text)
+        
+    except Exception as e:
+        METRICS.inc('errors_total', stage='search')
+        EVENTS.emit('error', stage='search', query=query, error=str(e))
+        UI.err(f"Erreur de recherche: {e}")
+        return []
+
+
+def get_product_details(url, silent=False):
+    """Recupere les details d'un produit"""
+    if not silent:
+        UI.status("Chargement des details...")
+    
+    try:
+        fetch_url = site_url(url)
+        cached = HTTP_CACHE.get(fetch_url)
+        t0 = time.perf_counter()
+        resp = FETCHER.get(fetch_url, headers=ResponseCache.validators(cached))
+        fetch_seconds = record_response('product', resp, time.perf_counter() - t0)
+        if EVENTS.enabled:
+            EVENTS.emit('fetched', url=url, status=resp.status_code, bytes=len(resp.content),
+                        seconds=round(fetch_seconds, 4), not_modified=resp.status_code == 304)
+        if resp.status_code == 304 and cached:
+            # Page inchangee: reutiliser le dernier resultat parse
+            METRICS.inc('cache_hits_total')
+            result = cached['result']
+            return {**result, 'offers': list(result['offers'])}
+        METRICS.inc('cache_misses_total')
+        resp.raise_for_status()
+        
+        t0 = time.perf_counter()
+        try:
+            result = {'url': url, **PARSE_POOL.extract(resp.text)}
+        except Exception:
+            METRICS.inc('parse_failures_total')
+            raise
+        parse_seconds = time.perf_counter() - t0
+        METRICS.observe('product_parse_seconds', parse_seconds)
+        if not result['best_price']:
+            METRICS.inc('parse_failures_total')
+        EVENTS.emit('parsed', url=url, seconds=round(parse_seconds, 4), best_price=result['best_price'],
+                    offers=len(result['offers']), total_offers=result.get('total_offers'))
+        result['offers'] = compact_offers(result['offers'])
+        HTTP_CACHE.put(fetch_url, resp.headers, result)
+        return result
+        
+    except Exception as e:
+        METRICS.inc('errors_total', stage='product')
+        EVENTS.emit('error', stage='product', url=url, error=str(e))
+        UI.err(f"Erreur de chargement: {e}")
+        return None
+
+
+# =============================================================================
+# DISCORD
+# =============================================================================
+
+def build_alert_embed(product, price, threshold):
+    """Construit l'embed Discord d'une alerte de prix"""
+    return {
+        "title": "ALERTE PRIX - GROSRAT",
+        "description": "Le prix est passe sous votre seuil!",
+        "color": 3066993,
+        "fields": [
+            {"name": "Produit", "value": product['title'][:256], "inline": False},
+            {"name": "Reference", "value": product.get('reference') or "N/A", "inline": True},
+            {"name": "Prix actuel", "value": f"**CHF {price:.2f}**", "inline": True},
+            {"name": "Seuil", "value": f"CHF {threshold:.2f}", "inline": True},
+            {"name": "Economie", "value": f"CHF {threshold - price:.2f}", "inline": True},
+            {"name": "Lien", "value": f"[Toppreise]({product['url']})", "inline": False},
+        ],
+        "footer": {"text": f"GROSRAT - {datetime.now().strftime('%d.%m.%Y %H:%M')}"},
+    }
+
+
+def send_discord(webhook, product, price, threshold):
+    """Envoie une notification Discord (immediatement, sans file d'attente)"""
+    return NOTIFIER.post(webhook, [build_alert_embed(product, price, threshold)])
+
+
+class DiscordNotifier:
+    """
+    File d'envoi des alertes Discord, traitee par un thread dedie pour ne
+    jamais bloquer les verifications. Les alertes d'un cycle sont regroupees
+    par webhook (DISCORD_MAX_EMBEDS par message) et les limites de debit de
+    Discord (429 / Retry-After, X-RateLimit-*) sont respectees.
+    """
+    
+    def __init__(self, http=None):
+        self.http = http
+        self._queue = queue.Queue()
+        self._pending = {}          # webhook -> embeds du cycle en cours
+        self._lock = threading.Lock()
+        self._thread = None
+        self._blocked_until = 0.0   # time.monotonic() de fin de limitation
+        self._sent = 0              # Alertes envoyees / perdues depuis report()
+        self._failed = 0
+    
+    def enqueue(self, webhook, embed, on_result=None):
+        """
+        Ajoute une alerte au cycle en cours (envoyee au prochain flush).
+        on_result(ok) est appele par le thread d'envoi une fois l'envoi
+        confirme (True) ou abandonne (False).
+        """
+        with self._lock:
+            self._pending.setdefault(webhook, []).append((embed, on_result))
+    
+    def flush(self):
+        """Fin de cycle: confie les alertes accumulees au thread d'envoi"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            if pending and (self._thread is None or not self._thread.is_alive()):
+                self._thread = threading.Thread(target=self._run, name='grosrat-discord', daemon=True)
+                self._thread.start()
+        for webhook, items in pending.items():
+            for i in range(0, len(items), DISCORD_MAX_EMBEDS):
+                self._queue.put((webhook, items[i:i + DISCORD_MAX_EMBEDS]))
+    
+    def close(self, timeout=30):
+        """Envoie ce qui reste puis arrete le thread (au plus 'timeout' secondes)"""
+        self.flush()
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout)
+    
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            webhook, items = item
+            ok = self.post(webhook, [embed for embed, _ in items])
+            with self._lock:
+                if ok:
+                    self._sent += len(items)
+                else:
+                    self._failed += len(items)
+            for _, on_result in items:
+                if on_result:
+                    on_result(ok)
+    
+    def report(self):
+        """(envoyees, en echec) depuis le dernier appel, pour affichage par l'appelant"""
+        with self._lock:
+            counts = (self._sent, self._failed)
+            self._sent = self._failed = 0
+        return counts
+    
+    def _wait_rate_limit(self):
+        delay = self._blocked_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    
+    def post(self, webhook, embeds):
+        """Envoie un message (jusqu'a 10 embeds) avec gestion des 429 et relances"""
+        http = self.http or HTTP
+        payload = {"username": "GROSRAT", "embeds": embeds}
+        
+        for attempt in range(DISCORD_RETRIES):
+            self._wait_rate_limit()
+            t0 = time.perf_counter()
+            try:
+                resp = http.post(webhook, json=payload)
+            except requests.RequestException as e:
+                METRICS.inc('errors_total', stage='discord')
+                log.warning(f"Discord: {e}, nouvelle tentative")
+                time.sleep(min(60, 2 ** attempt))
+                continue
+            METRICS.observe('discord_post_seconds', time.perf_counter() - t0)
+            METRICS.inc('http_responses_total', kind='discord', status=resp.status_code)
+            
+            if resp.status_code == 429:
+                # Retry-After en secondes (en-tete ou corps JSON)
+                try:
+                    retry_after = float(resp.headers.get('Retry-After') or resp.json().get('retry_after', 1))
+                except ValueError:
+                    retry_after = 1.0
+                self._blocked_until = time.monotonic() + retry_after
+                continue
+            if resp.status_code >= 500:
+                time.sleep(min(60, 2 ** attempt))
+                continue
+            if resp.status_code >= 400:
+                EVENTS.emit('error', stage='discord', status=resp.status_code)
+                log.error(f"Erreur Discord: HTTP {resp.status_code}")
+                return False
+            
+            # Seau epuise: attendre sa reinitialisation avant le prochain envoi
+            if resp.headers.get('X-RateLimit-Remaining') == '0':
+                try:
+                    reset_after = float(resp.headers.get('X-RateLimit-Reset-After', 0))
+                except ValueError:
+                    reset_after = 0.0
+                self._blocked_until = time.monotonic() + reset_after
+            
+            METRICS.inc('alerts_sent_total', len(embeds))
+            if EVENTS.enabled:
+                EVENTS.emit('alert_sent', count=len(embeds),
+                            products=[e['fields'][0]['value'] for e in embeds])
+            log.info(f"Notification Discord envoyee ({len(embeds)} alerte(s))")
+            return True
+        
+        EVENTS.emit('error', stage='discord', error=f"abandon apres {DISCORD_RETRIES} tentatives")
+        log.error(f"Erreur Discord: abandon apres {DISCORD_RETRIES} tentatives")
+        return False
+
+
+NOTIFIER = DiscordNotifier()
+
+
+class AlertState:
+    """
+    Etat d'alerte persistant par article, pour ne pas renvoyer la meme
+    alerte a chaque cycle:
+    - armed: le prochain passage sous le seuil declenche une alerte
+    - fired: alerte envoyee; nouvelle alerte seulement si le prix baisse
+      encore de ALERT_REDROP_PCT, re-armement quand il repasse au-dessus
+      du seuil + ALERT_HYSTERESIS_PCT
+    Un changement de seuil ou d'URL re-arme l'article. Une alerte dont
+    l'envoi echoue (ou n'a pas eu lieu avant l'arret) est renvoyee au
+    releve suivant: 'fired' n'est acquis qu'apres confirmation (delivered).
+    """
+    
+    def __init__(self, path=ALERT_STATE_FILE):
+        self.path = path
+        self._states = None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._unconfirmed = {}      # cle -> etat d'avant l'alerte, tant que l'envoi n'est pas confirme
+    
+    def _load(self):
+        if self._states is not None:
+            return
+        self._states = {}
+        if self.path and os.path.exists(self.path):
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._states = json.load(f)
+            except (OSError, ValueError) as e:
+                UI.warn(f"Etat des alertes illisible, re-armement general: {e}")
+    
+    def should_notify(self, key, price, threshold, url=None):
+        """Fait evoluer l'etat de l'article, retourne True si une alerte doit partir"""
+        key = str(key)
+        with self._lock:
+            self._load()
+            prev = st = self._states.get(key)
+            if st and (st.get('threshold') != threshold or st.get('url') != url):
+                st = None
+            notify = False
+            
+            if st is None or st['state'] == 'armed':
+                if price <= threshold:
+                    notify = True
+                    st = {'state': 'fired', 'price': price}
+                else:
+                    st = {'state': 'armed'}
+            elif price > threshold * (1 + ALERT_HYSTERESIS_PCT / 100):
+                st = {'state': 'armed'}
+            elif price <= st['price'] * (1 - ALERT_REDROP_PCT / 100):
+                notify = True
+                st = {'state': 'fired', 'price': price}
+            else:
+                return False
+            
+            st.update(threshold=threshold, url=url)
+            if notify:
+                # 'fired' n'est acquis qu'apres confirmation de l'envoi (delivered)
+                self._unconfirmed.setdefault(key, prev)
+            if notify or prev is None or any(prev.get(k) != st[k] for k in ('state', 'threshold', 'url')):
+                st['since'] = datetime.now().isoformat(timespec='seconds')
+                self._states[key] = st
+                self._dirty = True
+            return notify
+    
+    def is_current(self, key, threshold, url=None):
+        """True si l'article a deja ete evalue avec ce seuil et cette URL"""
+        with self._lock:
+            self._load()
+            st = self._states.get(str(key))
+            return (bool(st) and not st.get('retry')
+                    and st.get('threshold') == threshold and st.get('url') == url)
+    
+    @staticmethod
+    def _retry_state(prev):
+        """Etat d'avant une alerte non envoyee: reevaluee (et renvoyee) au prochain releve"""
+        return {**(prev or {'state': 'armed'}), 'retry': True}
+    
+    def delivered(self, key, ok):
+        """Resultat de l'envoi d'une alerte: confirme 'fired' ou revient a l'etat precedent"""
+        key = str(key)
+        with self._lock:
+            if key not in self._unconfirmed:
+                return
+            prev = self._unconfirmed.pop(key)
+            if not ok:
+                self._states[key] = self._retry_state(prev)
+            self._dirty = True
+            st = self._states.get(key)
+        # Mode reparti: les autres noeuds voient l'alerte confirmee (ou a renvoyer)
+        if SHARD is not None and st is not None:
+            try:
+                SHARD.publish_alerts({key: st})
+            except sqlite3.Error as e:
+                log.warning(f"Etat d'alerte non partage: {e}")
+    
+    def adopt(self, states):
+        """Remplace l'etat local par l'etat partage entre noeuds (cle -> etat)"""
+        with self._lock:
+            self._load()
+            for key, st in states.items():
+                if key not in self._unconfirmed and self._states.get(key) != st:
+                    self._states[key] = st
+                    self._dirty = True
+    
+    def export(self, keys):
+        """Etat des cles 'keys' a partager; alerte non confirmee: etat de reprise"""
+        with self._lock:
+            self._load()
+            states = {}
+            for key in map(str, keys):
+                if key in self._unconfirmed:
+                    states[key] = self._retry_state(self._unconfirmed[key])
+                elif key in self._states:
+                    states[key] = self._states[key]
+            return states
+    
+    def notify_callback(self, key):
+        """Callback on_result de DiscordNotifier.enqueue pour l'alerte 'key'"""
+        return lambda ok: self.delivered(key, ok)
+    
+    def save(self):
+        """Ecrit l'etat sur disque s'il a change"""
+        with self._lock:
+            if not self._dirty or not self.path:
+                return
+            data = dict(self._states)
+            # Alerte pas encore envoyee: en cas d'arret, elle repartira au redemarrage
+            for key, prev in self._unconfirmed.items():
+                data[key] = self._retry_state(prev)
+            self._dirty = False
+        try:
+            atomic_write_json(self.path, data, indent=2)
+        except OSError as e:
+            UI.warn(f"Etat des alertes non sauvegarde: {e}")
+
+
+ALERTS = AlertState()
+
+
+def _flush_alerts():
+    """Sortie: envoyer les alertes en attente, puis enregistrer leur etat"""
+    NOTIFIER.close(10)
+    ALERTS.save()
+
+
+atexit.register(_flush_alerts)
+
+
+# =============================================================================
+# HISTORIQUE DES PRIX
+# =============================================================================
+
+_PRODUCT_ID_RE = re.compile(r'-p(\d+)(?:[/?#]|$)')
+
+
+def product_id_from_url(url):
+    """Id Toppreise d'un produit depuis le suffixe -pNNNN de son URL (l'URL sinon)"""
+    m = _PRODUCT_ID_RE.search(url)
+    return m.group(1) if m else url
+
+
+class PriceHistory:
+    """
+    Historique des prix en SQLite (mode WAL).
+    Chaque verification enregistre le meilleur prix (checks) et les offres
+    relevees (offers). Un resultat identique au precedent n'ajoute que sa
+    ligne checks: ses offres sont celles du dernier releve qui en a.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS checks (
+            id INTEGER PRIMARY KEY,
+            product_id TEXT NOT NULL,
+            url TEXT NOT NULL,
+            checked_at REAL NOT NULL,
+            best_price REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_checks_product_time ON checks(product_id, checked_at);
+        CREATE TABLE IF NOT EXISTS offers (
+            check_id INTEGER NOT NULL REFERENCES checks(id) ON DELETE CASCADE,
+            shop TEXT NOT NULL,
+            price REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_offers_check ON offers(check_id);
+        CREATE TABLE IF NOT EXISTS fingerprints (
+            product_id TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            best_price REAL,
+            offers TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+    """
+    
+    def __init__(self, path=HISTORY_DB):
+        self.path = path
+        self._conn = None
+        self._lock = threading.Lock()
+    
+    def _db(self):
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("PRAGMA foreign_keys=ON")
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+    
+    def record(self, observations):
+        """
+        Enregistre un lot de verifications en une seule transaction.
+        observations: liste de dicts {'url', 'best_price', 'offers', 'checked_at'},
+        'fingerprint' (optionnel, voir offers_fingerprint) et 'unchanged' (optionnel:
+        resultat identique au precedent, seule la date et le prix sont ecrits)
+        """
+        if not observations:
+            return
+        with self._lock:
+            db = self._db()
+            with db:
+                for obs in observations:
+                    pid = product_id_from_url(obs['url'])
+                    checked_at = obs.get('checked_at') or time.time()
+                    cur = db.execute(
+                        "INSERT INTO checks (product_id, url, checked_at, best_price) VALUES (?, ?, ?, ?)",
+                        (pid, obs['url'], checked_at, obs.get('best_price')))
+                    if obs.get('unchanged'):
+                        continue
+                    check_id = cur.lastrowid
+                    db.executemany(
+                        "INSERT INTO offers (check_id, shop, price) VALUES (?, ?, ?)",
+                        [(check_id, o['shop'], o['price']) for o in obs.get('offers') or []])
+                    if obs.get('fingerprint'):
+                        db.execute(
+                            "INSERT OR REPLACE INTO fingerprints "
+                            "(product_id, fingerprint, best_price, offers, updated_at) VALUES (?, ?, ?, ?, ?)",
+                            (pid, obs['fingerprint'], obs.get('best_price'),
+                             json.dumps([{'shop': o['shop'], 'price': o['price']} for o in obs.get('offers') or []],
+                                        ensure_ascii=False),
+                             checked_at))
+    
+    def last_result(self, product_id):
+        """Dernier resultat enregistre {'fingerprint', 'best_price', 'offers'}, ou None"""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT fingerprint, best_price, offers FROM fingerprints WHERE product_id = ?",
+                (product_id,)).fetchone()
+        if row is None:
+            return None
+        return {'fingerprint': row[0], 'best_price': row[1], 'offers': json.loads(row[2])}
+    
+    def stats(self, product_id, hours=None):
+        """Retourne {'count', 'min', 'max', 'avg'} du meilleur prix sur la fenetre"""
+        since = time.time() - hours * 3600 if hours else 0
+        with self._lock:
+            row = self._db().execute(
+                "SELECT COUNT(best_price), MIN(best_price), MAX(best_price), AVG(best_price) "
+                "FROM checks WHERE product_id = ? AND checked_at >= ?",
+                (product_id, since)).fetchone()
+        return {'count': row[0], 'min': row[1], 'max': row[2], 'avg': row[3]}
+    
+    def last_checks(self):
+        """Date du dernier releve de chaque produit (id produit -> checked_at)"""
+        with self._lock:
+            return dict(self._db().execute(
+                "SELECT product_id, MAX(checked_at) FROM checks GROUP BY product_id").fetchall())
+    
+    def recent(self, product_id, limit):
+        """Les 'limit' derniers releves (checked_at, best_price), du plus ancien au plus recent"""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT checked_at, best_price FROM checks WHERE product_id = ? "
+                "ORDER BY checked_at DESC LIMIT ?",
+                (product_id, limit)).fetchall()
+        return rows[::-1]
+    
+    def series(self, product_id, hours=None):
+        """Liste chronologique de (checked_at, best_price)"""
+        since = time.time() - hours * 3600 if hours else 0
+        with self._lock:
+            return self._db().execute(
+                "SELECT checked_at, best_price FROM checks "
+                "WHERE product_id = ? AND checked_at >= ? ORDER BY checked_at",
+                (product_id, since)).fetchall()
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+HISTORY = PriceHistory()
+
+
+# =============================================================================
+# PLANIFICATION
+# =============================================================================
+
+def entry_interval(entry):
+    """Intervalle de verification d'un article, en secondes (au moins MIN_INTERVAL_SECONDS)"""
+    hours = float(entry.get('interval_hours') or CHECK_INTERVAL_HOURS)
+    if not math.isfinite(hours):
+        hours = CHECK_INTERVAL_HOURS
+    return max(MIN_INTERVAL_SECONDS, hours * 3600)
+
+
+def parse_window(window):
+    """
+    Convertit une plage horaire 'HH:MM-HH:MM' en minutes (debut, fin).
+    La plage peut passer minuit (22:00-06:00). Retourne None si invalide.
+    """
+    m = re.fullmatch(r'\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*', window or '')
+    if not m:
+        return None
+    h1, m1, h2, m2 = (int(x) for x in m.groups())
+    if h1 > 23 or m1 > 59 or m2 > 59 or h2 > 24 or (h2 == 24 and m2 != 0):
+        return None
+    return h1 * 60 + m1, h2 * 60 + m2
+
+
+def next_in_window(ts, window):
+    """Premier instant >= ts situe dans la plage horaire (ts si pas de plage)"""
+    bounds = parse_window(window) if window else None
+    if not bounds or bounds[0] == bounds[1]:
+        return ts
+    start, end = bounds
+    dt = datetime.fromtimestamp(ts)
+    minute = dt.hour * 60 + dt.minute
+    if start < end:
+        inside = start <= minute < end
+    else:
+        inside = minute >= start or minute < end
+    if inside:
+        return ts
+    
+    # Prochain debut de plage (aujourd'hui ou demain)
+    day = dt.replace(hour=0, minute=0, second=0, microsecond=0)
+    begin = day + timedelta(minutes=start)
+    if begin <= dt:
+        begin += timedelta(days=1)
+    return begin.timestamp()
+
+
+class PriceTrend:
+    """Evolution recente du prix d'un article, pour le mode adaptatif"""
+    
+    def __init__(self, observations=()):
+        self.prices = deque(maxlen=ADAPTIVE_WINDOW)
+        self.last_change = None
+        for ts, price in observations:
+            self.observe(price, ts)
+    
+    def observe(self, price, now):
+        if price is None:
+            return
+        if self.last_change is None or (self.prices and price != self.prices[-1]):
+            self.last_change = now
+        self.prices.append(price)
+    
+    @property
+    def moves(self):
+        """Nombre de variations de prix dans la fenetre"""
+        p = list(self.prices)
+        return sum(1 for a, b in zip(p, p[1:]) if a != b)
+
+
+def adaptive_interval(entry, trend, now):
+    """
+    Intervalle (secondes) du mode adaptatif:
+    - proche du seuil ou prix volatil: rapproche (ADAPTIVE_MIN_HOURS au plus court)
+    - prix inchange depuis ADAPTIVE_STABLE_DAYS: double a chaque periode stable
+    """
+    base = entry_interval(entry)
+    lo, hi = ADAPTIVE_MIN_HOURS * 3600, ADAPTIVE_MAX_HOURS * 3600
+    if not trend.prices:
+        return base
+    
+    price = trend.prices[-1]
+    if price <= entry.threshold * (1 + ADAPTIVE_MARGIN_PCT / 100):
+        return min(base, lo)
+    if trend.moves >= 2:
+        return max(lo, min(base, base / trend.moves))
+    
+    stable = now - trend.last_change
+    periods = int(stable // (ADAPTIVE_STABLE_DAYS * 86400))
+    if periods > 0:
+        return min(max(base, hi), base * 2 ** min(periods, 16))
+    return base
+
+
+class Scheduler:
+    """
+    Planning des verifications: tas (heapq) d'echeances par article.
+    Chaque article a son propre intervalle et sa plage horaire optionnelle.
+    Au demarrage, un article reprend a son dernier releve (HISTORY) plus son
+    intervalle; ceux jamais verifies ou en retard sont repartis sur leur
+    intervalle pour lisser la charge au lieu de tout verifier d'un coup.
+    Les entrees d'un meme produit partagent une echeance, la plus proche du
+    groupe: le produit est verifie au plus petit intervalle (eventuellement
+    adaptatif) de ses entrees.
+    """
+    
+    def __init__(self, adaptive=None):
+        self.adaptive = ADAPTIVE_SCHEDULING if adaptive is None else adaptive
+        self._heap = []          # (echeance, seq, id)
+        self._entries = {}       # id -> entree courante
+        self._due = {}           # id -> echeance valide (les autres sont perimees)
+        self._trends = {}        # id -> PriceTrend (mode adaptatif)
+        self._pids = {}          # id -> id produit
+        self._products = {}      # id produit -> ids des entrees
+        self._seq = itertools.count()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def _track(self, entry):
+        """Enregistre l'entree courante et son produit"""
+        pid = product_id_from_url(entry.url)
+        old = self._pids.get(entry.id)
+        if old != pid:
+            if old is not None:
+                self._products[old].discard(entry.id)
+            self._pids[entry.id] = pid
+            self._products.setdefault(pid, set()).add(entry.id)
+        self._entries[entry.id] = entry
+        return pid
+    
+    def _push(self, entry, due):
+        due = next_in_window(due, entry.window)
+        self._track(entry)
+        self._due[entry.id] = due
+        heapq.heappush(self._heap, (due, next(self._seq), entry.id))
+    
+    def _align(self, pid):
+        """Met les entrees planifiees du produit 'pid' sur l'echeance la plus proche"""
+        ids = [eid for eid in self._products.get(pid, ()) if eid in self._due]
+        if len(ids) < 2:
+            return
+        due = min(self._due[eid] for eid in ids)
+        for eid in ids:
+            if self._due[eid] != due:
+                self._push(self._entries[eid], due)
+    
+    def sync(self, entries, now=None):
+        """Aligne le planning sur la liste des articles actifs (TrackedEntry)"""
+        now = now or time.time()
+        active = {e.id: e for e in entries if e.is_active}
+        
+        for eid in list(self._entries):
+            if eid not in active:
+                self.remove(eid)
+        
+        # Nouveaux articles: premiere echeance d'apres le dernier releve de
+        # l'historique (redemarrage), sinon etalee sur leur intervalle
+        new_by_interval = {}
+        touched = set()
+        for eid, entry in active.items():
+            if eid in self._entries:
+                old = self._entries[eid]
+                if self._track(entry) != product_id_from_url(old.url):
+                    touched.add(self._pids[eid])
+                if eid in self._due and (entry_interval(old) != entry_interval(entry)
+                                         or old.window != entry.window):
+                    # Intervalle ou plage modifie: replanifier depuis la derniere
+                    # verification presumee plutot qu'attendre l'ancienne echeance
+                    last = self._due[eid] - entry_interval(old)
+                    self._push(entry, max(now, last + entry_interval(entry)))
+                    touched.add(self._pids[eid])
+            else:
+                new_by_interval.setdefault(entry_interval(entry), []).append(entry)
+        
+        # Les entrees d'un meme produit partagent leur echeance (une seule
+        # requete): celle d'une entree deja planifiee, sinon un creneau commun
+        planned = {}
+        for eid, due in self._due.items():
+            pid = self._pids[eid]
+            planned[pid] = min(due, planned.get(pid, due))
+        
+        last_checks = HISTORY.last_checks() if new_by_interval else {}
+        for interval, group in new_by_interval.items():
+            slots, resumed = {}, {}
+            for entry in group:
+                pid = product_id_from_url(entry.url)
+                if pid in planned:
+                    continue
+                last = last_checks.get(pid)
+                if last is not None and last + interval > now:
+                    resumed[pid] = last + interval
+                else:
+                    # Jamais verifie ou en retard: etale avec les autres
+                    slots.setdefault(pid, len(slots))
+            step = interval / max(1, len(slots))
+            for entry in group:
+                pid = product_id_from_url(entry.url)
+                if pid in planned:
+                    due = planned[pid]
+                elif pid in resumed:
+                    due = resumed[pid]
+                else:
+                    due = now + slots[pid] * step
+                self._push(entry, due)
+                touched.add(pid)
+        
+        for pid in touched:
+            self._align(pid)
+    
+    def remove(self, entry_id):
+        """Retire un article (suppression paresseuse dans le tas)"""
+        self._entries.pop(entry_id, None)
+        self._due.pop(entry_id, None)
+        self._trends.pop(entry_id, None)
+        pid = self._pids.pop(entry_id, None)
+        if pid is not None:
+            self._products[pid].discard(entry_id)
+            if not self._products[pid]:
+                del self._products[pid]
+    
+    def _prune(self):
+        while self._heap and self._due.get(self._heap[0][2]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+    
+    def next_due(self):
+        """Prochaine echeance (timestamp) ou None si le planning est vide"""
+        self._prune()
+        return self._heap[0][0] if self._heap else None
+    
+    def pop_due(self, now=None):
+        """Retire et retourne les articles arrives a echeance, du plus ancien au plus recent"""
+        now = now or time.time()
+        due = []
+        while True:
+            self._prune()
+            if not self._heap or self._heap[0][0] > now:
+                return due
+            _, _, eid = heapq.heappop(self._heap)
+            del self._due[eid]
+            due.append(self._entries[eid])
+    
+    def interval_for(self, entry, price=None, now=None):
+        """Intervalle apres une verification (fixe, ou adaptatif selon le prix releve)"""
+        if not self.adaptive:
+            return entry_interval(entry)
+        now = now or time.time()
+        trend = self._trends.get(entry.id)
+        if trend is None:
+            # Reprendre l'historique pour ne pas repartir de zero a chaque lancement
+            pid = product_id_from_url(entry.url)
+            trend = self._trends[entry.id] = PriceTrend(HISTORY.recent(pid, ADAPTIVE_WINDOW))
+        trend.observe(price, now)
+        return adaptive_interval(entry, trend, now)
+    
+    def _current_interval(self, entry, now):
+        """Intervalle d'une entree d'apres son dernier releve, sans en ajouter"""
+        trend = self._trends.get(entry.id) if self.adaptive else None
+        return adaptive_interval(entry, trend, now) if trend else entry_interval(entry)
+    
+    def reschedule(self, entry, now=None, price=None):
+        """
+        Replanifie un article apres verification, retourne l'intervalle applique:
+        le plus petit de ceux des entrees du produit, qui restent sur une
+        echeance commune.
+        """
+        if entry.id not in self._entries:
+            return None
+        now = now or time.time()
+        interval = self.interval_for(entry, price, now)
+        for eid in self._products[self._pids[entry.id]]:
+            if eid != entry.id:
+                interval = min(interval, self._current_interval(self._entries[eid], now))
+        self._push(self._entries[entry.id], now + interval)
+        self._align(self._pids[entry.id])
+        return interval
+    
+    def defer(self, entry, until):
+        """Repousse un article sans verification (verifie par un autre noeud)"""
+        if entry.id in self._entries:
+            self._push(self._entries[entry.id], until)
+    
+    def retry(self, entries, delay, now=None):
+        """Replanifie dans 'delay' secondes les articles d'un lot en echec pas encore replanifies"""
+        now = now or time.time()
+        for entry in entries:
+            if entry.id in self._entries and entry.id not in self._due:
+                self._push(self._entries[entry.id], now + delay)
+
+
+# =============================================================================
+# REPARTITION ENTRE NOEUDS
+# =============================================================================
+
+def lease_key(entry):
+    """Cle du bail d'un article (identifiant stable du fichier de configuration)"""
+    return str(entry.id)
+
+
+class LeaseStore:
+    """
+    Baux de verification partages entre noeuds (SQLite sur disque partage).
+    Un noeud ne verifie un article que s'il en obtient le bail: personne
+    d'autre ne le detient (ou il a expire) et son echeance commune est
+    atteinte. Le bail est renouvele pendant la verification; celui d'un
+    noeud arrete expire et l'article est repris par un autre.
+    """
+    
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS leases (
+            product_key TEXT PRIMARY KEY,
+            owner TEXT,
+            lease_until REAL NOT NULL DEFAULT 0,
+            checked_at REAL,
+            next_due REAL
+        );
+        CREATE TABLE IF NOT EXISTS alerts (
+            alert_key TEXT PRIMARY KEY,
+            state TEXT NOT NULL
+        );
+    """
+    
+    def __init__(self, path, node_id=None, lease_seconds=LEASE_SECONDS):
+        self.path = path
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds
+        self._conn = None
+        self._lock = threading.Lock()
+    
+    def _db(self):
+        if self._conn is None:
+            # Pas de WAL: il ne fonctionne pas sur un partage reseau
+            self._conn = sqlite3.connect(self.path, timeout=30, isolation_level=None,
+                                         check_same_thread=False)
+            self._conn.executescript(self.SCHEMA)
+        return self._conn
+    
+    @contextmanager
+    def _transaction(self):
+        """Transaction exclusive en ecriture (BEGIN IMMEDIATE)"""
+        with self._lock:
+            db = self._db()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                yield db
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+    
+    def claim(self, keys, now=None):
+        """
+        Tente d'obtenir le bail de chaque cle.
+        Retourne (obtenues, occupees) ou occupees: cle -> date a partir de
+        laquelle reessayer (fin du bail d'un autre noeud ou prochaine echeance).
+        """
+        now = now or time.time()
+        claimed, busy = [], {}
+        with self._transaction() as db:
+            db.executemany("INSERT OR IGNORE INTO leases (product_key) VALUES (?)",
+                           [(k,) for k in keys])
+            for key in keys:
+                owner, until, next_due = db.execute(
+                    "SELECT owner, lease_until, next_due FROM leases WHERE product_key = ?",
+                    (key,)).fetchone()
+                if owner and owner != self.node_id and until > now:
+                    busy[key] = until
+                elif next_due and next_due > now + LEASE_CLOCK_SLACK:
+                    busy[key] = next_due
+                else:
+                    claimed.append(key)
+            db.executemany("UPDATE leases SET owner = ?, lease_until = ? WHERE product_key = ?",
+                           [(self.node_id, now + self.lease_seconds, k) for k in claimed])
+        return claimed, busy
+    
+    def renew(self, keys, now=None):
+        """Prolonge les baux encore detenus par ce noeud"""
+        now = now or time.time()
+        with self._transaction() as db:
+            db.executemany(
+                "UPDATE leases SET lease_until = ? WHERE product_key = ? AND owner = ?",
+                [(now + self.lease_seconds, k, self.node_id) for k in keys])
+    
+    def complete(self, done, now=None, alerts=None, unfinished=()):
+        """
+        Libere les baux apres verification et publie la prochaine echeance.
+        done: liste de (cle, intervalle en secondes)
+        alerts: etats d'alerte (AlertState.export) publies dans la meme transaction
+        unfinished: cles non verifiees (lot interrompu), liberees sans changer l'echeance
+        """
+        now = now or time.time()
+        with self._transaction() as db:
+            db.executemany(
+                "UPDATE leases SET owner = NULL, lease_until = 0, checked_at = ?, next_due = ? "
+                "WHERE product_key = ? AND owner = ?",
+                [(now, now + interval, k, self.node_id) for k, interval in done])
+            db.executemany(
+                "UPDATE leases SET owner = NULL, lease_until = 0 WHERE product_key = ? AND owner = ?",
+                [(k, self.node_id) for k in unfinished])
+            if alerts:
+                self._write_alerts(db, alerts)
+    
+    def alert_states(self, keys):
+        """Etats d'alerte partages des cles 'keys' (cle -> etat)"""
+        with self._lock:
+            db = self._db()
+            states = {}
+            for key in map(str, keys):
+                row = db.execute("SELECT state FROM alerts WHERE alert_key = ?", (key,)).fetchone()
+                if row:
+                    states[key] = json.loads(row[0])
+            return states
+    
+    def publish_alerts(self, states):
+        """Publie des etats d'alerte (cle -> etat) pour les autres noeuds"""
+        with self._transaction() as db:
+            self._write_alerts(db, states)
+    
+    @staticmethod
+    def _write_alerts(db, states):
+        db.executemany(
+            "INSERT INTO alerts (alert_key, state) VALUES (?, ?) "
+            "ON CONFLICT(alert_key) DO UPDATE SET state = excluded.state",
+            [(str(k), json.dumps(st)) for k, st in states.items()])
+    
+    def release_all(self):
+        """Rend tous les baux de ce noeud (arret), sans marquer de verification"""
+        with self._transaction() as db:
+            db.execute("UPDATE leases SET owner = NULL, lease_until = 0 WHERE owner = ?",
+                       (self.node_id,))
+    
+    @contextmanager
+    def heartbeat(self, keys):
+        """Renouvelle les baux de 'keys' en arriere-plan pendant le bloc"""
+        stop = threading.Event()
+        
+        def beat():
+            while not stop.wait(self.lease_seconds / 3):
+                try:
+                    self.renew(keys)
+                except sqlite3.Error as e:
+                    UI.warn(f"Renouvellement des baux impossible: {e}")
+        
+        thread = threading.Thread(target=beat, name='grosrat-lease', daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+    
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
 
 
-# =============================================================================
-# DISCORD
-# =============================================================================
+SHARD = None    # LeaseStore en mode reparti (--shard-db)
 
-def send_discord(webhook, product, price, threshold):
-    """Envoie une notification Discord"""
-    embed = {
-        "title": "ALERTE PRIX - GROSRAT",
-        "description": "Le prix est passe sous votre seuil!",
-        "color": 3066993,
-        "fields": [
-            {"name": "Produit", "value": product['title'][:256], "inline": False},
-            {"name": "Reference", "value": product.get('reference') or "N/A", "inline": True},
-            {"name": "Prix actuel", "value": f"**CHF {price:.2f}**", "inline": True},
-            {"name": "Seuil", "value": f"CHF {threshold:.2f}", "inline": True},
-            {"name": "Economie", "value": f"CHF {threshold - price:.2f}", "inline": True},
-            {"name": "Lien", "value": f"[Toppreise]({product['url']})", "inline": False},
-        ],
-        "footer": {"text": f"GROSRAT - {datetime.now().strftime('%d.%m.%Y %H:%M')}"},
-    }
-    
-    try:
-        resp = requests.post(webhook, json={"username": "GROSRAT", "embeds": [embed]}, timeout=10)
-        resp.raise_for_status()
-        UI.ok("Notification Discord envoyee!")
-        return True
-    except Exception as e:
-        UI.err(f"Erreur Discord: {e}")
-        return False
+
+def claim_due(scheduler, now=None):
+    """
+    Articles a echeance. En mode reparti, seulement ceux dont ce noeud
+    obtient le bail; les autres sont repousses a leur prochaine echeance.
+    """
+    due = scheduler.pop_due(now)
+    if SHARD is None or not due:
+        return due
+    claimed, busy = SHARD.claim([lease_key(e) for e in due], now)
+    for entry in due:
+        until = busy.get(lease_key(entry))
+        if until is not None:
+            scheduler.defer(entry, until)
+    claimed = set(claimed)
+    return [e for e in due if lease_key(e) in claimed]
 
 
 # =============================================================================
 # SUIVI
 # =============================================================================
 
-def check_price(product, threshold, webhook):
-    """Verifie le prix actuel, retourne (price, offers)"""
+def check_price(product, threshold, webhook, alert_key=None):
+    """
+    Verifie le prix actuel, retourne (price, offers).
+    L'alerte n'est envoyee qu'une fois par passage sous le seuil (voir AlertState);
+    alert_key identifie l'article (l'URL par defaut).
+    """
     details = get_product_details(product['url'], silent=True)
     
     if details and details['best_price']:
         price = details['best_price']
         offers = details.get('offers', [])
         
-        if price <= threshold:
-            if webhook:
-                send_discord(webhook, product, price, threshold)
+        if webhook:
+            key = product['url'] if alert_key is None else alert_key
+            if ALERTS.should_notify(key, price, threshold, product['url']):
+                NOTIFIER.enqueue(webhook, build_alert_embed(product, price, threshold),
+                                 ALERTS.notify_callback(key))
         
         return price, offers
     return None, []
 
 
+def offers_fingerprint(best_price, offers):
+    """Empreinte d'un resultat: meilleur prix et paires (shop, prix) triees"""
+    pairs = sorted((o['shop'], o['price']) for o in offers)
+    return hashlib.sha1(json.dumps([best_price, pairs]).encode('utf-8')).hexdigest()[:16]
+
+
+def diff_offers(old, new):
+    """
+    Differences entre deux listes d'offres:
+    {'kind': 'new' | 'removed', 'shop', 'price'} ou {'kind': 'moved', 'shop', 'old', 'new'}
+    """
+    before = {o['shop']: o['price'] for o in old}
+    after = {o['shop']: o['price'] for o in new}
+    changes = []
+    for o in new:
+        if o['shop'] not in before:
+            changes.append({'kind': 'new', 'shop': o['shop'], 'price': o['price']})
+        elif before[o['shop']] != o['price']:
+            changes.append({'kind': 'moved', 'shop': o['shop'], 'old': before[o['shop']], 'new': o['price']})
+    for o in old:
+        if o['shop'] not in after:
+            changes.append({'kind': 'removed', 'shop': o['shop'], 'price': o['price']})
+    return changes
+
+
+def check_product_group(entries, webhook):
+    """
+    Verifie un produit suivi par plusieurs entrees: une seule requete et un
+    seul parsing, puis le seuil et l'alerte de chaque entree.
+    Retourne (price, offers, changes, fingerprint); changes vaut None au
+    premier releve, [] si le resultat est identique au precedent (l'alerte
+    n'est alors pas reevaluee), sinon la liste des differences (diff_offers).
+    """
+    url = entries[0].url
+    if EVENTS.enabled:
+        EVENTS.emit('check_started', url=url, entry_ids=[e.id for e in entries])
+    details = get_product_details(url, silent=True)
+    
+    if details and details['best_price']:
+        price = details['best_price']
+        offers = details.get('offers', [])
+        fingerprint = offers_fingerprint(price, offers)
+        last = HISTORY.last_result(product_id_from_url(url))
+        if last is None:
+            changes = None
+        elif last['fingerprint'] == fingerprint:
+            changes = []
+        else:
+            changes = diff_offers(last['offers'], offers)
+            if last['best_price'] != price:
+                changes.insert(0, {'kind': 'best', 'old': last['best_price'], 'new': price})
+        
+        EVENTS.price(url, price, [e.id for e in entries])
+        if webhook:
+            for e in entries:
+                if changes == [] and ALERTS.is_current(e.id, e.threshold, e.url):
+                    continue
+                if ALERTS.should_notify(e.id, price, e.threshold, e.url):
+                    NOTIFIER.enqueue(webhook, build_alert_embed(e.product, price, e.threshold),
+                                     ALERTS.notify_callback(e.id))
+        return price, offers, changes, fingerprint
+    return None, [], None, None
+
+
+def check_prices(entries, webhook, max_workers=None):
+    """
+    Verifie plusieurs produits en parallele (au plus 'max_workers' a la fois,
+    MAX_WORKERS par defaut).
+    Les entrees d'un meme produit (meme id Toppreise) partagent une seule
+    verification. Genere des tuples (entry, price, offers, changes, fingerprint)
+    dans l'ordre de 'entries', chacun des que son resultat est disponible.
+    """
+    if not entries:
+        return
+    
+    groups = OrderedDict()
+    for e in entries:
+        groups.setdefault(product_id_from_url(e.url), []).append(e)
+    
+    pool = ThreadPoolExecutor(max_workers=max(1, min(max_workers or MAX_WORKERS, len(groups))),
+                              thread_name_prefix='grosrat-check')
+    try:
+        check = PROFILER.wrap(check_product_group)
+        futures = {pid: pool.submit(check, group, webhook) for pid, group in groups.items()}
+        for entry in entries:
+            try:
+                result = futures[product_id_from_url(entry.url)].result()
+            except Exception as e:
+                EVENTS.emit('error', stage='check', entry_id=entry.id, error=str(e))
+                UI.err(f"Erreur de verification: {e}")
+                result = None, [], None, None
+            yield (entry,) + result
+    finally:
+        # Annule les verifications pas encore demarrees (Ctrl+C, retour menu)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def run_batch(entries, webhook, scheduler=None, on_result=None):
+    """
+    Verifie un lot d'articles: verification concurrente, replanification
+    et enregistrement de l'historique en une transaction.
+    on_result(entry, price, offers, interval, changes) est appele dans l'ordre
+    du lot (changes: voir check_product_group). Un produit dont le resultat
+    n'a pas change n'ajoute a l'historique que la date et le prix du releve.
+    """
+    with PROFILER.cycle('batch'):
+        if SHARD is None:
+            _run_batch(entries, webhook, scheduler, on_result)
+            return
+        keys = [lease_key(e) for e in entries]
+        # L'etat d'alerte suit le bail: le noeud qui verifie reprend celui du
+        # dernier noeud a avoir verifie l'article, puis le publie en rendant le bail
+        ALERTS.adopt(SHARD.alert_states(keys))
+        done = []
+        
+        def completed(entry, price, offers, interval, changes=None):
+            done.append((lease_key(entry), interval or entry_interval(entry)))
+            if on_result:
+                on_result(entry, price, offers, interval, changes)
+        
+        try:
+            with SHARD.heartbeat(keys):
+                _run_batch(entries, webhook, scheduler, completed)
+        finally:
+            # Lot interrompu: les baux des articles non verifies sont rendus aussi
+            finished = {k for k, _ in done}
+            SHARD.complete(done, alerts=ALERTS.export(keys),
+                           unfinished=[k for k in keys if k not in finished])
+
+
+def _run_batch(entries, webhook, scheduler, on_result):
+    t0 = time.perf_counter()
+    observations = []
+    recorded = set()    # Un releve par produit, meme suivi par plusieurs entrees
+    for entry, price, offers, changes, fingerprint in check_prices(entries, webhook):
+        METRICS.inc('checks_total', result='unchanged' if changes == [] else 'ok' if price else 'error')
+        interval = scheduler.reschedule(entry, price=price) if scheduler else None
+        pid = product_id_from_url(entry.url)
+        if price and pid not in recorded:
+            recorded.add(pid)
+            observations.append({
+                'url': entry.url,
+                'best_price': price,
+                'offers': offers,
+                'checked_at': time.time(),
+                'fingerprint': fingerprint,
+                'unchanged': changes == [],
+            })
+        if on_result:
+            on_result(entry, price, offers, interval, changes)
+    
+    NOTIFIER.flush()
+    ALERTS.save()
+    with METRICS.timer('history_write_seconds'):
+        HISTORY.record(observations)
+    HTTP_CACHE.save()
+    METRICS.observe('batch_seconds', time.perf_counter() - t0)
+    if METRICS_DUMP:
+        METRICS.dump(METRICS_DUMP)
+
+
+def journal_path(path=None):
+    """Journal des modifications associe au fichier de configuration"""
+    return (path or CONFIG_FILE) + '.journal'
+
+
+def write_config(data, path=None):
+    """
+    Ecrit la configuration complete de facon atomique.
+    Le journal, deja integre a 'data', est ensuite supprime (compaction).
+    """
+    path = path or CONFIG_FILE
+    atomic_write_json(path, data, indent=2)
+    try:
+        os.remove(journal_path(path))
+    except FileNotFoundError:
+        pass
+
+
 def save_config(product, threshold, webhook):
     """Sauvegarde la configuration (ancien format - legacy)"""
     config = {
@@ -638,43 +3025,132 @@ def save_config(product, threshold, webhook):
         'webhook': webhook,
         'created': datetime.now().isoformat()
     }
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, indent=2, ensure_ascii=False)
+    write_config(config)
     UI.ok(f"Config sauvegardee: {CONFIG_FILE}")
 
 
-def load_tracked_products():
-    """Charge la liste des produits suivis"""
-    if not os.path.exists(CONFIG_FILE):
-        return {'products': [], 'webhook': ''}
-    try:
-        with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            # Migration ancien format
-            if 'product' in data and 'products' not in data:
-                return {
-                    'products': [{
-                        'id': 1,
-                        'product': data['product'],
-                        'threshold': data['threshold'],
-                        'active': True,
-                        'created': data.get('created', datetime.now().isoformat())
-                    }],
-                    'webhook': data.get('webhook', '')
-                }
-            return data
-    except:
-        return {'products': [], 'webhook': ''}
+def apply_journal_op(data, op):
+    """
+    Applique une operation du journal. Les operations sont idempotentes
+    (ajout = remplacement par id), rejouer le journal sur une configuration
+    deja compactee donne donc le meme resultat.
+    """
+    kind = op.get('op')
+    if kind == 'add':
+        entry = op['entry']
+        for i, p in enumerate(data['products']):
+            if p.get('id') == entry['id']:
+                data['products'][i] = entry
+                break
+        else:
+            data['products'].append(entry)
+    elif kind == 'remove':
+        data['products'] = [p for p in data['products'] if p.get('id') != op['id']]
+    elif kind == 'set':
+        data[op['key']] = op['value']
+    elif kind == 'batch':
+        # Plusieurs operations ecrites en une seule ligne (tout ou rien)
+        for sub in op['ops']:
+            apply_journal_op(data, sub)
+
+
+def replay_journal(data, path=None):
+    """Rejoue le journal sur 'data' (une derniere ligne tronquee est ignoree)"""
+    jpath = journal_path(path)
+    if not os.path.exists(jpath):
+        return data
+    with open(jpath, 'r', encoding='utf-8') as f:
+        for n, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                op = json.loads(line)
+            except ValueError:
+                UI.warn(f"Journal: ligne {n} illisible ignoree")
+                continue
+            apply_journal_op(data, op)
+    return data
+
+
+def append_journal(data, ops, path=None):
+    """
+    Ajoute des operations au journal (une ligne JSON chacune) au lieu de
+    reecrire toute la configuration; compacte quand le journal devient gros.
+    'data' doit deja contenir les operations appliquees.
+    """
+    path = path or CONFIG_FILE
+    if not os.path.exists(path):
+        # Pas encore de fichier de base: l'ecrire directement
+        write_config(data, path)
+        return
+    jpath = journal_path(path)
+    with open(jpath, 'ab+') as f:
+        # Terminer une eventuelle ligne tronquee par un crash
+        f.seek(0, os.SEEK_END)
+        if f.tell():
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b'\n':
+                f.write(b'\n')
+        for op in ops:
+            f.write((json.dumps(op, ensure_ascii=False) + '\n').encode('utf-8'))
+        f.flush()
+        os.fsync(f.fileno())
+        size = f.tell()
+    if size >= JOURNAL_COMPACT_BYTES:
+        write_config(data, path)
+
+
+def load_tracked_products(path=None, set_aside=True):
+    """
+    Charge la liste des produits suivis (fichier de base + journal).
+    Un fichier au JSON invalide est mis de cote (*.corrupt-*), ou l'erreur
+    propagee si set_aside est faux; les autres erreurs d'E/S (droits,
+    descripteurs epuises) sont propagees: le fichier est peut-etre valide
+    et ne doit pas etre remplace par une liste vide.
+    """
+    path = path or CONFIG_FILE
+    data = {'products': [], 'webhook': ''}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except ValueError as e:
+            if not set_aside:
+                raise
+            # Ne jamais ecraser une config illisible: la mettre de cote
+            backup = f"{path}.corrupt-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
+            try:
+                os.replace(path, backup)
+                UI.err(f"Configuration illisible ({e}), sauvegardee sous {backup}")
+            except OSError:
+                UI.err(f"Configuration illisible: {e}")
+            data = {'products': [], 'webhook': ''}
+        
+        # Migration ancien format
+        if 'product' in data and 'products' not in data:
+            data = {
+                'products': [{
+                    'id': 1,
+                    'product': data['product'],
+                    'threshold': data['threshold'],
+                    'active': True,
+                    'created': data.get('created', datetime.now().isoformat())
+                }],
+                'webhook': data.get('webhook', '')
+            }
+    
+    data.setdefault('products', [])
+    data.setdefault('webhook', '')
+    return replay_journal(data, path)
 
 
 def save_tracked_products(data):
-    """Sauvegarde la liste des produits suivis"""
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    """Sauvegarde la liste complete des produits suivis"""
+    write_config(data)
 
 
-def add_tracked_product(data, product, threshold):
-    """Ajoute un produit a la liste de suivi"""
+def new_tracked_entry(data, product, threshold, interval_hours=None, window=None, active=True):
+    """Construit une entree de suivi avec un nouvel ID (sans l'ajouter)"""
     # Generer un nouvel ID
     max_id = 0
     for p in data['products']:
@@ -685,18 +3161,317 @@ def add_tracked_product(data, product, threshold):
         'id': max_id + 1,
         'product': product,
         'threshold': threshold,
-        'active': True,
+        'active': active,
         'created': datetime.now().isoformat()
     }
+    if interval_hours:
+        new_entry['interval_hours'] = interval_hours
+    if window:
+        new_entry['window'] = window
+    return new_entry
+
+
+def add_tracked_product(data, product, threshold, interval_hours=None):
+    """Ajoute un produit a la liste de suivi"""
+    new_entry = new_tracked_entry(data, product, threshold, interval_hours)
     data['products'].append(new_entry)
-    save_tracked_products(data)
+    append_journal(data, [{'op': 'add', 'entry': new_entry}])
     return new_entry['id']
 
 
+def add_tracked_products(data, items):
+    """
+    Ajoute plusieurs produits en une seule ligne de journal (operation 'batch'):
+    apres un crash, soit tous sont ajoutes, soit aucun.
+    items: liste de dicts {'product', 'threshold', 'interval_hours', 'window', 'active'}
+    Retourne les IDs crees.
+    """
+    entries = []
+    for item in items:
+        entry = new_tracked_entry(data, item['product'], item['threshold'],
+                                  item.get('interval_hours'), item.get('window'),
+                                  item.get('active', True))
+        data['products'].append(entry)
+        entries.append(entry)
+    if entries:
+        append_journal(data, [{'op': 'batch', 'ops': [{'op': 'add', 'entry': e} for e in entries]}])
+    return [e['id'] for e in entries]
+
+
 def remove_tracked_product(data, product_id):
     """Supprime un produit de la liste"""
     data['products'] = [p for p in data['products'] if p.get('id') != product_id]
-    save_tracked_products(data)
+    append_journal(data, [{'op': 'remove', 'id': product_id}])
+
+
+def set_webhook(data, webhook):
+    """Change le webhook Discord global"""
+    data['webhook'] = webhook
+    append_journal(data, [{'op': 'set', 'key': 'webhook', 'value': webhook}])
+
+
+# Colonnes des fichiers d'import / export (CSV avec en-tete ou JSONL)
+IMPORT_FIELDS = ['query', 'url', 'product_id', 'threshold', 'interval_hours', 'window', 'active', 'title']
+
+
+def _import_format(path, fmt=None):
+    if fmt:
+        return fmt
+    return 'csv' if path.lower().endswith('.csv') else 'jsonl'
+
+
+def _import_flag(value):
+    """Booleen d'import (JSON ou texte CSV); absent = True, illisible = None"""
+    if isinstance(value, bool):
+        return value
+    text = str(value if value is not None else '').strip().lower()
+    if text in ('', '1', 'true', 'o', 'oui', 'y', 'yes'):
+        return True
+    if text in ('0', 'false', 'n', 'non', 'no'):
+        return False
+    return None
+
+
+def read_import_rows(path, fmt=None):
+    """
+    Lit un fichier d'import: une ligne par article avec 'query', 'url' ou
+    'product_id' (id Toppreise) et 'threshold'; 'interval_hours', 'window' et
+    'active' (false: ajoute en pause) sont optionnels. Retourne une liste de dicts (numero de ligne dans '_line';
+    ligne illisible: seulement '_line' et le message dans '_error').
+    """
+    rows = []
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        if _import_format(path, fmt) == 'csv':
+            for n, row in enumerate(csv.DictReader(f), 2):
+                rows.append({**{k.strip(): (v or '').strip() for k, v in row.items() if k}, '_line': n})
+        else:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    rows.append({'_line': n, '_error': f"JSON invalide: {e}"})
+                    continue
+                if not isinstance(row, dict):
+                    rows.append({'_line': n, '_error': "objet JSON attendu"})
+                    continue
+                rows.append({**row, '_line': n})
+    return rows
+
+
+def resolve_import_row(row):
+    """
+    Resout une ligne d'import en article a suivre (recherche et/ou page produit).
+    Retourne (item, None) ou (None, message d'erreur).
+    """
+    if row.get('_error'):
+        return None, row['_error']
+    threshold = parse_chf(str(row.get('threshold') or ''))
+    if not threshold or threshold <= 0:
+        return None, "seuil manquant ou invalide"
+    try:
+        interval_hours = float(row['interval_hours']) if row.get('interval_hours') else None
+    except (TypeError, ValueError):
+        return None, "intervalle invalide"
+    if interval_hours is not None and (not math.isfinite(interval_hours) or interval_hours <= 0):
+        return None, "intervalle invalide"
+    window = row.get('window') or None
+    if window and parse_window(window) is None:
+        return None, "plage horaire invalide"
+    active = _import_flag(row.get('active'))
+    if active is None:
+        return None, "'active' invalide"
+    
+    url = row.get('url') or None
+    pid = str(row.get('product_id') or '').strip()
+    query = row.get('query') or pid
+    if not url:
+        if not query:
+            return None, "ni 'url', ni 'product_id', ni 'query'"
+        results = search_product(query, silent=True)
+        if pid:
+            results = [r for r in results if r['id'] == pid]
+        if not results:
+            return None, f"aucun produit trouve pour '{query}'"
+        url = results[0]['url']
+    
+    details = get_product_details(url, silent=True)
+    if not details or not details.get('title'):
+        return None, f"page produit illisible ({url})"
+    product = {
+        'title': details['title'],
+        'reference': details['reference'],
+        'url': details['url'],
+        'best_price': details.get('best_price')
+    }
+    return {'product': product, 'threshold': threshold,
+            'interval_hours': interval_hours, 'window': window, 'active': active}, None
+
+
+def import_products(path, fmt=None, max_workers=None):
+    """
+    Importe un fichier d'articles: resolution concurrente, puis ajout en une
+    seule ecriture. Les articles deja suivis avec le meme seuil sont ignores.
+    Retourne (ids ajoutes, [(ligne, erreur)]).
+    """
+    rows = read_import_rows(path, fmt)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers or MAX_WORKERS, len(rows) or 1)),
+                            thread_name_prefix='grosrat-import') as pool:
+        resolved = list(pool.map(resolve_import_row, rows))
+    
+    data = CONFIG.get()
+    existing = {(product_id_from_url(p['product']['url']), p['threshold']) for p in data['products']}
+    items, errors = [], []
+    for row, (item, error) in zip(rows, resolved):
+        if error:
+            errors.append((row['_line'], error))
+            continue
+        key = (product_id_from_url(item['product']['url']), item['threshold'])
+        if key in existing:
+            errors.append((row['_line'], f"deja suivi: {item['product']['title'][:50]}"))
+            continue
+        existing.add(key)
+        items.append(item)
+    
+    ids = add_tracked_products(data, items)
+    CONFIG.invalidate()
+    return ids, errors
+
+
+def export_products(path, fmt=None):
+    """Exporte les articles suivis dans le format d'import. Retourne le nombre d'articles."""
+    rows = []
+    for p in CONFIG.get()['products']:
+        pid = product_id_from_url(p['product']['url'])
+        rows.append({
+            'query': '',
+            'url': p['product']['url'],
+            'product_id': pid if pid != p['product']['url'] else '',
+            'threshold': p['threshold'],
+            'interval_hours': p.get('interval_hours') or '',
+            'window': p.get('window') or '',
+            'active': bool(p.get('active', True)),
+            'title': p['product'].get('title', ''),
+        })
+    
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        if _import_format(path, fmt) == 'csv':
+            writer = csv.DictWriter(f, fieldnames=IMPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            for row in rows:
+                f.write(json.dumps({k: v for k, v in row.items() if v != ''}, ensure_ascii=False) + '\n')
+    return len(rows)
+
+
+class ConfigStore:
+    """
+    Configuration gardee en memoire, rechargee seulement quand le fichier
+    de base ou son journal change (mtime / taille / inode).
+    refresh() retourne les changements depuis le dernier chargement; un
+    rechargement qui echoue (sauvegarde partielle d'un editeur) garde la
+    derniere version valide. En mode compact (daemon, sans ecriture de la configuration), les
+    articles sont gardes uniquement sous forme de TrackedEntry.
+    """
+    
+    def __init__(self, path=None, compact=False):
+        self.path = path
+        self.compact = compact
+        self._data = None
+        self._entries = None
+        self._signature = None
+        self._failed = None     # Signature d'un rechargement en echec (reessaye au prochain changement)
+        self._lock = threading.Lock()
+    
+    def _current_path(self):
+        return self.path or CONFIG_FILE
+    
+    def _stat(self):
+        path = self._current_path()
+        sig = []
+        for f in (path, journal_path(path)):
+            try:
+                st = os.stat(f)
+                sig.append((st.st_mtime_ns, st.st_size, st.st_ino))
+            except FileNotFoundError:
+                sig.append(None)
+        return (path, tuple(sig))
+    
+    def get(self):
+        """Retourne la configuration courante (rechargee si le fichier a change)"""
+        self.refresh()
+        return self._data
+    
+    def refresh(self):
+        """
+        Recharge la configuration si le fichier a change.
+        Retourne une liste d'evenements (type, valeur):
+        ('added', entry), ('removed', entry), ('changed', entry), ('webhook', url)
+        """
+        with self._lock:
+            # Signature prise avant la lecture: une ecriture concurrente
+            # provoquera simplement un nouveau chargement au prochain appel
+            sig = self._stat()
+            if self._data is not None and sig in (self._signature, self._failed):
+                return []
+            old = self._data
+            try:
+                # Seul le premier chargement met de cote un fichier invalide
+                data = load_tracked_products(sig[0], set_aside=old is None)
+            except (OSError, ValueError) as e:
+                if old is None:
+                    raise
+                self._failed = sig
+                log.warning(f"Configuration illisible, derniere version valide conservee: {e}")
+                return []
+            self._data = data
+            self._signature = sig
+            self._failed = None
+            self._entries = None
+            if self.compact:
+                self._data['products'] = self._entries = [
+                    TrackedEntry.from_dict(p) for p in self._data['products']]
+            if old is None:
+                return []
+            return diff_config(old, self._data)
+    
+    def entries(self):
+        """Articles suivis sous forme de TrackedEntry (reconstruits apres rechargement)"""
+        self.refresh()
+        with self._lock:
+            if self._entries is None:
+                self._entries = [TrackedEntry.from_dict(p) for p in self._data['products']]
+            return self._entries
+    
+    def invalidate(self):
+        """Force le rechargement au prochain acces"""
+        with self._lock:
+            self._signature = None
+
+
+def diff_config(old, new):
+    """Evenements de changement entre deux configurations"""
+    events = []
+    old_entries = {p.get('id'): p for p in old['products']}
+    new_entries = {p.get('id'): p for p in new['products']}
+    
+    for pid, entry in new_entries.items():
+        if pid not in old_entries:
+            events.append(('added', entry))
+        elif entry != old_entries[pid]:
+            events.append(('changed', entry))
+    for pid, entry in old_entries.items():
+        if pid not in new_entries:
+            events.append(('removed', entry))
+    
+    if old.get('webhook', '') != new.get('webhook', ''):
+        events.append(('webhook', new.get('webhook', '')))
+    return events
+
+
+CONFIG = ConfigStore()
 
 
 def start_tracking(product, threshold, webhook):
@@ -723,6 +3498,9 @@ def start_tracking(product, threshold, webhook):
             UI.header()
             
             price, offers = check_price(product, threshold, webhook)
+            NOTIFIER.flush()
+            if price:
+                HISTORY.record([{'url': product['url'], 'best_price': price, 'offers': offers}])
             
             # Afficher les offres
             UI.offers_box(offers)
@@ -745,6 +3523,50 @@ def start_tracking(product, threshold, webhook):
         UI.status("Relancez pour reprendre")
 
 
+def print_check_result(entry, price, offers, interval=None, changes=None):
+    """
+    Affiche le resultat de la verification d'un article: une ligne si rien
+    n'a change, sinon le detail et les differences d'offres.
+    """
+    threshold = entry.threshold
+    
+    title = entry.product.title
+    if len(title) > 50:
+        title = title[:47] + '...'
+    
+    if price and changes == []:
+        print(f"  {C.BCYN}[{entry.id}]{C.RST} {C.DIM}{title} - inchange (CHF {price:.2f}){C.RST}")
+        return
+    
+    print()
+    print(f"  {C.BCYN}[{entry.id}]{C.RST} {C.WHT}{title}{C.RST}")
+    
+    if price:
+        if price <= threshold:
+            status = f"{C.BGRN}CHF {price:.2f} <= {threshold:.2f} [ALERTE!]{C.RST}"
+        else:
+            diff = price - threshold
+            status = f"{C.YLW}CHF {price:.2f}{C.RST} (seuil: {threshold:.2f}, ecart: +{diff:.2f})"
+        print(f"      {status}")
+        
+        if offers:
+            best = offers[0]
+            print(f"      {C.DIM}Meilleur: {best.shop} a CHF {best.price:.2f}{C.RST}")
+        
+        for c in changes or []:
+            if c['kind'] == 'new':
+                print(f"      {C.BGRN}+{C.RST} {c['shop']} CHF {c['price']:.2f}")
+            elif c['kind'] == 'removed':
+                print(f"      {C.BRED}-{C.RST} {c['shop']} {C.DIM}CHF {c['price']:.2f}{C.RST}")
+            elif c['kind'] == 'moved':
+                print(f"      {C.BYLW}~{C.RST} {c['shop']} CHF {c['old']:.2f} -> {c['new']:.2f}")
+    else:
+        print(f"      {C.BRED}Erreur de chargement{C.RST}")
+    
+    if interval:
+        print(f"      {C.DIM}Prochaine verification dans {interval / 3600:.1f}h{C.RST}")
+
+
 def start_multi_tracking(data):
     """Demarre le suivi automatique de plusieurs produits"""
     webhook = data.get('webhook', '')
@@ -758,7 +3580,7 @@ def start_multi_tracking(data):
     UI.section("DEMARRAGE DU SUIVI MULTI-ARTICLES", C.GRN)
     
     UI.info("Articles", f"{len(products)} produit(s)")
-    UI.info("Intervalle", f"{CHECK_INTERVAL_HOURS}h (4x/jour)")
+    UI.info("Intervalle", f"{CHECK_INTERVAL_HOURS}h par defaut, verifications reparties")
     UI.info("Discord", "Actif" if webhook else "Inactif")
     
     print()
@@ -771,70 +3593,74 @@ def start_multi_tracking(data):
     time.sleep(2)
     
     count = 0
+    scheduler = Scheduler()
+    scheduler.sync(CONFIG.entries())
+    pending_events = []
     
     try:
         while True:
-            count += 1
-            UI.header()
-            
-            # Recharger les produits (au cas ou modifies)
-            data = load_tracked_products()
-            products = [p for p in data['products'] if p.get('active', True)]
+            # Recharger les produits seulement si le fichier a change
+            pending_events += CONFIG.refresh()
+            data = CONFIG.get()
             webhook = data.get('webhook', '')
+            scheduler.sync(CONFIG.entries())
             
-            print()
-            print(C.YLW + UI.box_top() + C.RST)
-            print(C.YLW + UI.box_row(f"SUIVI MULTI-ARTICLES - Verification #{count}", 'center', C.BOLD) + C.RST)
-            print(C.YLW + UI.box_row(datetime.now().strftime('%d.%m.%Y %H:%M:%S'), 'center', C.DIM) + C.RST)
-            print(C.YLW + UI.box_bot() + C.RST)
-            
-            # Verifier chaque produit
-            for entry in products:
-                product = entry['product']
-                threshold = entry['threshold']
+            due = claim_due(scheduler)
+            if due:
+                count += 1
+                UI.header()
                 
                 print()
-                title = product['title']
-                if len(title) > 50:
-                    title = title[:47] + '...'
+                print(C.YLW + UI.box_top() + C.RST)
+                print(C.YLW + UI.box_row(f"SUIVI MULTI-ARTICLES - Verification #{count}", 'center', C.BOLD) + C.RST)
+                print(C.YLW + UI.box_row(datetime.now().strftime('%d.%m.%Y %H:%M:%S'), 'center', C.DIM) + C.RST)
+                print(C.YLW + UI.box_row(f"{len(due)} article(s) a echeance sur {len(scheduler)}", 'center', C.DIM) + C.RST)
+                print(C.YLW + UI.box_bot() + C.RST)
                 
-                print(f"  {C.BCYN}[{entry['id']}]{C.RST} {C.WHT}{title}{C.RST}")
+                # Resultat des envois Discord du cycle precedent (thread d'envoi)
+                sent, failed = NOTIFIER.report()
+                if sent:
+                    UI.ok(f"Notification Discord envoyee! ({sent} alerte(s))")
+                if failed:
+                    UI.err(f"Erreur Discord: {failed} alerte(s) non envoyee(s)")
                 
-                price, offers = check_price(product, threshold, webhook)
+                for kind, value in pending_events:
+                    if kind == 'added':
+                        print(f"  {C.BGRN}+{C.RST} [{value['id']}] {value['product']['title'][:50]}")
+                    elif kind == 'removed':
+                        print(f"  {C.BRED}-{C.RST} [{value['id']}] {value['product']['title'][:50]}")
+                    elif kind == 'changed':
+                        print(f"  {C.BYLW}~{C.RST} [{value['id']}] {value['product']['title'][:50]}")
+                pending_events = []
                 
-                if price:
-                    if price <= threshold:
-                        status = f"{C.BGRN}CHF {price:.2f} <= {threshold:.2f} [ALERTE!]{C.RST}"
-                    else:
-                        diff = price - threshold
-                        status = f"{C.YLW}CHF {price:.2f}{C.RST} (seuil: {threshold:.2f}, ecart: +{diff:.2f})"
-                    print(f"      {status}")
-                    
-                    if offers:
-                        best = offers[0]
-                        print(f"      {C.DIM}Meilleur: {best['shop']} a CHF {best['price']:.2f}{C.RST}")
-                else:
-                    print(f"      {C.BRED}Erreur de chargement{C.RST}")
+                # Verifier les produits en parallele, affichage dans l'ordre
+                def show(entry, price, offers, interval, changes):
+                    print_check_result(entry, price, offers, interval if scheduler.adaptive else None, changes)
                 
-                time.sleep(1)  # Pause entre requetes
-            
-            # Prochaine verification
-            next_t = datetime.now().timestamp() + (CHECK_INTERVAL_HOURS * 3600)
-            next_str = datetime.fromtimestamp(next_t).strftime('%d.%m.%Y %H:%M')
-            
-            print()
-            print(C.CYN + UI.box_top() + C.RST)
-            print(C.CYN + UI.box_row(f"Prochaine verification: {next_str}", 'center') + C.RST)
-            print(C.CYN + UI.box_mid() + C.RST)
-            print(C.CYN + UI.box_row("") + C.RST)
-            print(C.CYN + UI.box_row(" >> Retour au menu", color=C.BOLD + '\033[7m') + C.RST)
-            print(C.CYN + UI.box_row("") + C.RST)
-            print(C.CYN + UI.box_mid() + C.RST)
-            print(C.CYN + UI.box_row("Entree: valider", 'center', C.DIM) + C.RST)
-            print(C.CYN + UI.box_bot() + C.RST)
+                run_batch(due, webhook, scheduler, show)
+                
+                # Prochaine verification
+                next_t = scheduler.next_due()
+                next_str = datetime.fromtimestamp(next_t).strftime('%d.%m.%Y %H:%M') if next_t else "-"
+                
+                print()
+                print(C.CYN + UI.box_top() + C.RST)
+                print(C.CYN + UI.box_row(f"Prochaine verification: {next_str}", 'center') + C.RST)
+                print(C.CYN + UI.box_mid() + C.RST)
+                print(C.CYN + UI.box_row("") + C.RST)
+                print(C.CYN + UI.box_row(" >> Retour au menu", color=C.BOLD + '\033[7m') + C.RST)
+                print(C.CYN + UI.box_row("") + C.RST)
+                print(C.CYN + UI.box_mid() + C.RST)
+                print(C.CYN + UI.box_row("Entree: valider", 'center', C.DIM) + C.RST)
+                print(C.CYN + UI.box_bot() + C.RST)
             
-            # Attente interruptible
-            if wait_with_keycheck(CHECK_INTERVAL_HOURS * 3600):
+            # Attente interruptible jusqu'a la prochaine echeance, en relisant
+            # regulierement la liste pour prendre en compte les modifications
+            next_t = scheduler.next_due()
+            wait = (CONFIG_POLL_SECONDS or 3600) if next_t is None else next_t - time.time()
+            if CONFIG_POLL_SECONDS:
+                wait = min(wait, CONFIG_POLL_SECONDS)
+            if wait_with_keycheck(max(0, wait)):
                 # Retour au menu demande
                 print()
                 UI.status("Retour au menu...")
@@ -846,6 +3672,144 @@ def start_multi_tracking(data):
         UI.warn("Suivi arrete")
         UI.status("Retour au menu...")
         time.sleep(1)
+    finally:
+        # Retour au menu: les autres noeuds peuvent reprendre nos articles
+        if SHARD is not None:
+            SHARD.release_all()
+
+
+# =============================================================================
+# MODE DAEMON
+# =============================================================================
+
+class JsonLogFormatter(logging.Formatter):
+    """Une ligne JSON par message, champs structures dans extra={'fields': {...}}"""
+    
+    def format(self, record):
+        line = {
+            'ts': datetime.fromtimestamp(record.created).isoformat(timespec='seconds'),
+            'level': record.levelname.lower(),
+            'msg': record.getMessage(),
+        }
+        line.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            line['exc'] = self.formatException(record.exc_info)
+        return json.dumps(line, ensure_ascii=False)
+
+
+def setup_logging(level='INFO', fmt='text'):
+    """Journalisation sur stderr (captee par systemd / docker)"""
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonLogFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    log.handlers[:] = [handler]
+    log.setLevel(level.upper())
+    log.propagate = False
+
+
+def log_check_result(entry, price, offers, interval=None, changes=None):
+    """Journalise le resultat de la verification d'un article (DEBUG s'il est inchange)"""
+    fields = {
+        'event': 'check',
+        'entry_id': entry.id,
+        'url': entry.url,
+        'threshold': entry.threshold,
+        'price': price,
+        'best_shop': offers[0].shop if offers else None,
+        'next_in_h': round(interval / 3600, 2) if interval else None,
+    }
+    if changes:
+        fields['changes'] = changes
+    if price is not None and changes == []:
+        fields['unchanged'] = True
+        log.debug(f"[{entry.id}] CHF {price:.2f} inchange", extra={'fields': fields})
+    elif price is None:
+        log.warning(f"[{entry.id}] erreur de chargement", extra={'fields': fields})
+    elif price <= entry.threshold:
+        log.info(f"[{entry.id}] CHF {price:.2f} <= {entry.threshold:.2f} (alerte)", extra={'fields': fields})
+    else:
+        log.info(f"[{entry.id}] CHF {price:.2f} (seuil {entry.threshold:.2f})", extra={'fields': fields})
+
+
+def run_daemon(adaptive=None):
+    """
+    Boucle de suivi sans interface (systemd, conteneurs).
+    SIGTERM / SIGINT: arret propre apres le lot en cours.
+    SIGHUP: relecture immediate de la configuration.
+    SIGUSR1: profilage du prochain lot (voir CycleProfiler).
+    """
+    UI.headless = True
+    CONFIG.compact = True
+    CONFIG.invalidate()
+    # Drapeaux poses par les gestionnaires de signal: pas de verrou (Event,
+    # logging) dans un gestionnaire, le fil principal peut deja le detenir
+    received = {'stop': None, 'reload': False}
+    
+    def on_stop(signum, frame):
+        received['stop'] = signal.Signals(signum).name
+        wake_up()
+    
+    def on_reload(signum, frame):
+        received['reload'] = True
+        wake_up()
+    
+    signal.signal(signal.SIGTERM, on_stop)
+    signal.signal(signal.SIGINT, on_stop)
+    if hasattr(signal, 'SIGHUP'):
+        signal.signal(signal.SIGHUP, on_reload)
+    
+    scheduler = Scheduler(adaptive)
+    data = CONFIG.get()
+    log.info(f"Demarrage: {len(data['products'])} article(s), config {os.path.abspath(CONFIG_FILE)}",
+             extra={'fields': {'event': 'start', 'version': VERSION}})
+    
+    while not received['stop']:
+        if received['reload']:
+            received['reload'] = False
+            CONFIG.invalidate()
+            log.info("Rechargement de la configuration (SIGHUP)")
+        
+        for kind, value in CONFIG.refresh():
+            if kind == 'webhook':
+                log.info("Webhook Discord modifie", extra={'fields': {'event': 'config_webhook'}})
+            else:
+                log.info(f"Article {value['id']} {kind}",
+                         extra={'fields': {'event': f'config_{kind}', 'entry_id': value['id']}})
+        data = CONFIG.get()
+        scheduler.sync(CONFIG.entries())
+        
+        due = claim_due(scheduler)
+        if due:
+            log.debug(f"{len(due)} article(s) a echeance sur {len(scheduler)}")
+            try:
+                run_batch(due, data.get('webhook', ''), scheduler, log_check_result)
+            except Exception as e:
+                # Base verrouillee, disque plein...: le service continue, le
+                # lot est retente plus tard
+                METRICS.inc('errors_total', stage='batch')
+                log.exception(f"Lot de verification en echec: {e}",
+                              extra={'fields': {'event': 'batch_error', 'entries': len(due)}})
+                scheduler.retry(due, BATCH_RETRY_SECONDS)
+            continue
+        
+        next_t = scheduler.next_due()
+        wait = (CONFIG_POLL_SECONDS or 3600) if next_t is None else next_t - time.time()
+        if CONFIG_POLL_SECONDS:
+            wait = min(wait, CONFIG_POLL_SECONDS)
+        wait_for_wakeup(wait)
+    
+    log.info(f"Signal {received['stop']}, arret")
+    NOTIFIER.close()
+    ALERTS.save()
+    EVENTS.close()
+    HTTP_CACHE.save(force=True)
+    HISTORY.close()
+    if SHARD is not None:
+        SHARD.release_all()
+        SHARD.close()
+    log.info("Arrete", extra={'fields': {'event': 'stop'}})
 
 
 # =============================================================================
@@ -854,7 +3818,7 @@ def start_multi_tracking(data):
 
 def screen_main_menu():
     """Menu principal avec navigation interactive"""
-    data = load_tracked_products()
+    data = CONFIG.get()
     nb_products = len(data['products'])
     nb_active = len([p for p in data['products'] if p.get('active', True)])
     
@@ -880,7 +3844,7 @@ def screen_main_menu():
 
 def screen_list_products():
     """Affiche la liste des produits suivis"""
-    data = load_tracked_products()
+    data = CONFIG.get()
     
     UI.header()
     UI.section(f"ARTICLES SUIVIS ({len(data['products'])})", C.CYN)
@@ -902,7 +3866,15 @@ def screen_list_products():
                 title = title[:42] + '...'
             
             print(f"  {C.YLW}[{entry['id']}]{C.RST} {status_icon}{C.RST} {C.WHT}{title}{C.RST}")
-            print(f"       {C.DIM}Ref: {product.get('reference', 'N/A')} | Seuil: CHF {threshold:.2f}{C.RST}")
+            interval = entry.get('interval_hours') or CHECK_INTERVAL_HOURS
+            window = f" ({entry['window']})" if entry.get('window') else ""
+            print(f"       {C.DIM}Ref: {product.get('reference', 'N/A')} | Seuil: CHF {threshold:.2f} | "
+                  f"Toutes les {interval:g}h{window}{C.RST}")
+            
+            stats = HISTORY.stats(product_id_from_url(product['url']), hours=24 * 7)
+            if stats['count']:
+                print(f"       {C.DIM}7 jours: min CHF {stats['min']:.2f} | moy CHF {stats['avg']:.2f} | "
+                      f"max CHF {stats['max']:.2f} ({stats['count']} releves){C.RST}")
             print()
     
     # Webhook status
@@ -919,7 +3891,7 @@ def screen_list_products():
 
 def screen_remove_product():
     """Supprime un produit"""
-    data = load_tracked_products()
+    data = CONFIG.get()
     
     UI.header()
     UI.section("SUPPRIMER UN ARTICLE", C.RED)
@@ -966,7 +3938,7 @@ def screen_remove_product():
 
 def screen_config_discord():
     """Configure le webhook Discord global"""
-    data = load_tracked_products()
+    data = CONFIG.get()
     
     UI.header()
     UI.section("CONFIGURATION DISCORD", C.MAG)
@@ -995,8 +3967,7 @@ def screen_config_discord():
             if not UI.confirm("Continuer quand meme?"):
                 return
     
-    data['webhook'] = webhook
-    save_tracked_products(data)
+    set_webhook(data, webhook)
     
     if webhook:
         UI.ok("Webhook configure")
@@ -1021,6 +3992,7 @@ def add_product_flow():
     threshold = screen_threshold(details.get('best_price'))
     if not threshold:
         return False
+    interval_hours = screen_interval()
     
     # Produit a suivre
     product = {
@@ -1031,8 +4003,8 @@ def add_product_flow():
     }
     
     # Ajouter a la liste
-    data = load_tracked_products()
-    new_id = add_tracked_product(data, product, threshold)
+    data = CONFIG.get()
+    new_id = add_tracked_product(data, product, threshold, interval_hours)
     
     UI.header()
     UI.section("ARTICLE AJOUTE", C.GRN)
@@ -1041,6 +4013,7 @@ def add_product_flow():
     UI.info("ID", f"#{new_id}")
     UI.info("Produit", product['title'][:50])
     UI.info("Seuil", f"CHF {threshold:.2f}")
+    UI.info("Intervalle", f"{interval_hours or CHECK_INTERVAL_HOURS:g}h")
     
     print()
     UI.ok("L'article a ete ajoute a la liste de suivi!")
@@ -1142,6 +4115,25 @@ def screen_threshold(current_price):
         return None
 
 
+def screen_interval():
+    """Ecran de l'intervalle de verification (vide = valeur par defaut)"""
+    print()
+    print(f"  {C.WHT}Intervalle entre deux verifications, en heures.{C.RST}")
+    print(f"  {C.DIM}Laissez vide pour la valeur par defaut ({CHECK_INTERVAL_HOURS}h).{C.RST}")
+    
+    val = UI.prompt("Intervalle (h)")
+    if not val:
+        return None
+    try:
+        hours = float(val.replace(",", ".").replace("h", "").strip())
+        if hours <= 0:
+            raise ValueError
+        return hours
+    except ValueError:
+        UI.warn(f"Valeur invalide, intervalle par defaut ({CHECK_INTERVAL_HOURS}h)")
+        return None
+
+
 def screen_discord():
     """Ecran Discord"""
     UI.header()
@@ -1193,7 +4185,126 @@ def screen_summary(product, threshold, webhook):
 # MAIN
 # =============================================================================
 
-def main():
+def state_path(path, state_dir):
+    """Chemin d'un fichier d'etat: relatif au dossier d'etat, sauf chemin absolu"""
+    if not path or os.path.isabs(path):
+        return path
+    return os.path.join(state_dir, path)
+
+
+def parse_args(argv=None):
+    """Arguments de la ligne de commande"""
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--config', default=argparse.SUPPRESS,
+                        help=f"Fichier des articles suivis (defaut: {CONFIG_FILE})")
+    common.add_argument('--state-dir', default=argparse.SUPPRESS,
+                        help="Dossier de l'historique, du cache HTTP et de l'etat des alertes "
+                             "(defaut: celui de --config)")
+    common.add_argument('--base-url', default=argparse.SUPPRESS,
+                        help=f"Site a interroger (defaut: {BASE_URL}, ou $GROSRAT_BASE_URL)")
+    common.add_argument('--fetch', choices=['live', 'record', 'replay', 'memory'], default=argparse.SUPPRESS,
+                        help="Source des pages: site, site + enregistrement, cassettes, site + cache memoire")
+    common.add_argument('--cassettes', default=argparse.SUPPRESS,
+                        help="Dossier des pages enregistrees (defaut: cassettes)")
+    common.add_argument('--metrics-port', type=int, default=argparse.SUPPRESS,
+                        help="Exposer /metrics (Prometheus) et /metrics.json sur 127.0.0.1:PORT")
+    common.add_argument('--metrics-dump', default=argparse.SUPPRESS,
+                        help="Ecrire les metriques en JSON dans ce fichier apres chaque lot")
+    common.add_argument('--events', default=argparse.SUPPRESS,
+                        help="Ecrire chaque evenement de suivi en JSONL dans ce fichier")
+    common.add_argument('--events-max-mb', type=float, default=argparse.SUPPRESS,
+                        help=f"Rotation du flux d'evenements (defaut: {EVENTS_MAX_BYTES // (1024 * 1024)} Mo)")
+    common.add_argument('--events-gzip', action='store_true', default=argparse.SUPPRESS,
+                        help="Compresser les segments du flux d'evenements apres rotation")
+    common.add_argument('--shard-db', default=argparse.SUPPRESS,
+                        help="Base SQLite partagee: repartir les articles entre plusieurs noeuds")
+    common.add_argument('--node-id', default=argparse.SUPPRESS,
+                        help="Nom de ce noeud en mode reparti (defaut: hote-pid)")
+    common.add_argument('--max-workers', type=int, default=argparse.SUPPRESS,
+                        help=f"Produits verifies en parallele au plus (defaut: {MAX_WORKERS})")
+    common.add_argument('--rate-limit', type=float, default=argparse.SUPPRESS,
+                        help=f"Requetes/seconde max par hote, 0 = illimite (defaut: {RATE_LIMIT_PER_HOST:g})")
+    common.add_argument('--parse-workers', type=int, default=argparse.SUPPRESS,
+                        help="Parser les pages dans N processus (defaut: 0, parsing local)")
+    common.add_argument('--profile-cycle', action='store_true', default=argparse.SUPPRESS,
+                        help="Profiler le premier cycle de verification (SIGUSR1: le suivant)")
+    common.add_argument('--profile-dir', default=argparse.SUPPRESS,
+                        help=f"Dossier des rapports de profilage (defaut: {PROFILE_DIR})")
+    
+    parser = argparse.ArgumentParser(prog='grosrat.py', parents=[common],
+                                     description="GROSRAT - Price Tracker pour Toppreise.ch")
+    sub = parser.add_subparsers(dest='command')
+    
+    d = sub.add_parser('daemon', parents=[common], help="Suivi sans interface (systemd, conteneurs)")
+    d.add_argument('--log-level', default='INFO', help="DEBUG, INFO, WARNING, ERROR")
+    d.add_argument('--log-format', choices=['text', 'json'], default='text')
+    d.add_argument('--adaptive', action='store_true', help="Frequence de verification adaptative")
+    
+    for name, help_text in (('import', "Ajouter les articles d'un fichier CSV / JSONL"),
+                            ('export', "Exporter les articles suivis en CSV / JSONL")):
+        c = sub.add_parser(name, parents=[common], help=help_text)
+        c.add_argument('file', help="Fichier .csv (avec en-tete) ou .jsonl")
+        c.add_argument('--format', choices=['csv', 'jsonl'], help="Format (defaut: selon l'extension)")
+    
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global CONFIG_FILE, BASE_URL, FETCHER, METRICS_DUMP, SHARD, MAX_WORKERS, RATE_LIMIT_PER_HOST
+    args = parse_args(argv)
+    CONFIG_FILE = getattr(args, 'config', CONFIG_FILE)
+    # Fichiers d'etat a cote de la configuration: sous systemd le repertoire
+    # courant est souvent / (non inscriptible)
+    state_dir = getattr(args, 'state_dir', None) or os.path.dirname(os.path.abspath(CONFIG_FILE))
+    os.makedirs(state_dir, exist_ok=True)
+    HISTORY.path = state_path(HISTORY.path, state_dir)
+    HTTP_CACHE.path = state_path(HTTP_CACHE.path, state_dir)
+    ALERTS.path = state_path(ALERTS.path, state_dir)
+    BASE_URL = getattr(args, 'base_url', BASE_URL)
+    FETCHER = make_fetcher(getattr(args, 'fetch', 'live'), getattr(args, 'cassettes', None))
+    METRICS_DUMP = getattr(args, 'metrics_dump', METRICS_DUMP)
+    MAX_WORKERS = max(1, getattr(args, 'max_workers', MAX_WORKERS))
+    RATE_LIMIT_PER_HOST = max(0.0, getattr(args, 'rate_limit', RATE_LIMIT_PER_HOST))
+    RATE_LIMITER.set_rate(RATE_LIMIT_PER_HOST)
+    EVENTS.path = getattr(args, 'events', EVENTS.path)
+    if hasattr(args, 'events_max_mb'):
+        EVENTS.max_bytes = int(args.events_max_mb * 1024 * 1024)
+    EVENTS.compress = getattr(args, 'events_gzip', EVENTS.compress)
+    shard_db = getattr(args, 'shard_db', SHARD_DB)
+    if shard_db:
+        SHARD = LeaseStore(shard_db, getattr(args, 'node_id', None))
+    
+    # Avant tout autre thread: les processus de parsing sont crees par fork
+    PARSE_POOL.workers = getattr(args, 'parse_workers', PARSE_POOL.workers)
+    PARSE_POOL.start()
+    
+    metrics_port = getattr(args, 'metrics_port', METRICS_PORT)
+    if metrics_port:
+        start_metrics_server(metrics_port)
+    
+    PROFILER.folder = getattr(args, 'profile_dir', PROFILER.folder)
+    if getattr(args, 'profile_cycle', False):
+        PROFILER.request()
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, lambda signum, frame: PROFILER.request())
+    
+    if args.command == 'daemon':
+        setup_logging(args.log_level, args.log_format)
+        run_daemon(adaptive=True if args.adaptive else None)
+        return
+    
+    if args.command == 'import':
+        ids, errors = import_products(args.file, args.format)
+        for line, error in errors:
+            UI.warn(f"Ligne {line}: {error}")
+        UI.ok(f"{len(ids)} article(s) ajoute(s), {len(errors)} ignore(s)")
+        sys.exit(1 if errors and not ids else 0)
+    
+    if args.command == 'export':
+        count = export_products(args.file, args.format)
+        UI.ok(f"{count} article(s) exporte(s) dans {args.file}")
+        return
+    
     # Activer couleurs Windows
     if os.name == 'nt':
         os.system('color')
@@ -1220,7 +4331,7 @@ def main():
         
         elif choice == 's':
             # Demarrer le suivi
-            data = load_tracked_products()
+            data = CONFIG.get()
             active = [p for p in data['products'] if p.get('active', True)]
             
             if not active:
@@ -0,0 +1,78 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import grosrat  # noqa: E402
+
+
+def product_page(title, offers):
+    """Page produit minimale: offers = [(shop, prix), ...]"""
+    rows = ''.join(
+        f'<div class="row"><div class="Plugin_ShopLogo"><img alt="{shop}"></div>'
+        f'<div class="Plugin_Price">{price:.2f}</div></div>'
+        for shop, price in offers)
+    best = min(price for _, price in offers)
+    return (f'<html><body><h1>{title}</h1><div>{len(offers)} Angebote ab CHF {best:.2f}</div>'
+            f'{rows}</body></html>')
+
+
+class PageFetcher(grosrat.Fetcher):
+    """Sert des pages en memoire et compte les requetes par URL"""
+    
+    def __init__(self, pages=None):
+        self.pages = dict(pages or {})
+        self.calls = []
+    
+    def get(self, url, **kwargs):
+        self.calls.append(url)
+        if url not in self.pages:
+            return grosrat.StoredResponse(url, 404, '')
+        return grosrat.StoredResponse(url, 200, self.pages[url])
+
+
+class SentAlerts:
+    """Remplace NOTIFIER: garde les alertes au lieu de les envoyer"""
+    
+    def __init__(self):
+        self.embeds = []
+    
+    def enqueue(self, webhook, embed, on_result=None):
+        self.embeds.append(embed)
+        if on_result:
+            on_result(True)
+    
+    def flush(self):
+        pass
+    
+    def close(self, timeout=None):
+        pass
+
+
+@pytest.fixture
+def tracker(tmp_path, monkeypatch):
+    """Etat global isole: cache, historique, alertes et pages dans tmp_path"""
+    fetcher = PageFetcher()
+    monkeypatch.setattr(grosrat, 'FETCHER', fetcher)
+    monkeypatch.setattr(grosrat, 'HTTP_CACHE', grosrat.ResponseCache(path=None))
+    monkeypatch.setattr(grosrat, 'HISTORY', grosrat.PriceHistory(str(tmp_path / 'history.db')))
+    monkeypatch.setattr(grosrat, 'ALERTS', grosrat.AlertState(str(tmp_path / 'alerts.json')))
+    monkeypatch.setattr(grosrat, 'NOTIFIER', SentAlerts())
+    monkeypatch.setattr(grosrat, 'CONFIG_FILE', str(tmp_path / 'tracked_products.json'))
+    monkeypatch.setattr(grosrat, 'CONFIG', grosrat.ConfigStore())
+    monkeypatch.setattr(grosrat, 'SHARD', None)
+    monkeypatch.setattr(grosrat.UI, 'headless', True)
+    yield fetcher
+    grosrat.HISTORY.close()
+
+
+def make_entry(entry_id, url, threshold, **extra):
+    return grosrat.TrackedEntry.from_dict({
+        'id': entry_id,
+        'product': {'title': f"Produit {entry_id}", 'reference': '', 'url': url},
+        'threshold': threshold,
+        'active': True,
+        **extra,
+    })
@@ -0,0 +1,45 @@
+import json
+
+import grosrat
+
+
+URL = "https://x/a-p1"
+
+
+def test_failed_delivery_rearms(tmp_path):
+    alerts = grosrat.AlertState(str(tmp_path / 'alerts.json'))
+    assert alerts.should_notify(1, 90.0, 100.0, URL)
+    alerts.delivered(1, False)
+    assert not alerts.is_current(1, 100.0, URL)
+    # Meme prix au releve suivant: l'alerte repart
+    assert alerts.should_notify(1, 90.0, 100.0, URL)
+    alerts.delivered(1, True)
+    assert not alerts.should_notify(1, 90.0, 100.0, URL)
+
+
+def test_unconfirmed_alert_is_not_saved_as_fired(tmp_path):
+    path = tmp_path / 'alerts.json'
+    alerts = grosrat.AlertState(str(path))
+    assert alerts.should_notify(1, 90.0, 100.0, URL)
+    alerts.save()
+    assert json.loads(path.read_text())['1']['state'] != 'fired'
+    
+    # Arret avant l'envoi: l'alerte repart au redemarrage
+    restarted = grosrat.AlertState(str(path))
+    assert restarted.should_notify(1, 90.0, 100.0, URL)
+    
+    alerts.delivered(1, True)
+    alerts.save()
+    assert json.loads(path.read_text())['1']['state'] == 'fired'
+
+
+def test_notifier_reports_delivery_to_alert_state(monkeypatch):
+    from test_discord import FakeHttp
+    monkeypatch.setattr(grosrat.time, 'sleep', lambda seconds: None)
+    alerts = grosrat.AlertState(None)
+    notifier = grosrat.DiscordNotifier(FakeHttp([500] * grosrat.DISCORD_RETRIES))
+    
+    assert alerts.should_notify(1, 90.0, 100.0, URL)
+    notifier.enqueue('https://hook', {'title': 'a'}, alerts.notify_callback(1))
+    notifier.close(timeout=5)
+    assert alerts.should_notify(1, 90.0, 100.0, URL)
@@ -0,0 +1,111 @@
+import json
+import os
+
+import pytest
+
+import grosrat
+
+
+def write(path, data):
+    path.write_text(json.dumps(data), encoding='utf-8')
+
+
+def entry(i):
+    return {'id': i, 'product': {'title': f"P{i}", 'url': f"https://x/a-p{i}"}, 'threshold': 10.0}
+
+
+def test_unreadable_config_is_not_set_aside(tmp_path, monkeypatch):
+    path = tmp_path / 'tracked_products.json'
+    write(path, {'products': [entry(1)], 'webhook': ''})
+    real_open = open
+    
+    def denied(file, *args, **kwargs):
+        if os.fspath(file) == str(path):
+            raise PermissionError(13, "Permission denied")
+        return real_open(file, *args, **kwargs)
+    
+    monkeypatch.setattr('builtins.open', denied)
+    with pytest.raises(PermissionError):
+        grosrat.load_tracked_products(str(path))
+    monkeypatch.undo()
+    assert grosrat.load_tracked_products(str(path))['products'] == [entry(1)]
+
+
+def test_invalid_json_is_set_aside(tmp_path, monkeypatch):
+    monkeypatch.setattr(grosrat.UI, 'headless', True)
+    path = tmp_path / 'tracked_products.json'
+    path.write_text('{"products": [', encoding='utf-8')
+    assert grosrat.load_tracked_products(str(path))['products'] == []
+    assert not path.exists()
+    assert len(list(tmp_path.glob('tracked_products.json.corrupt-*'))) == 1
+
+
+def test_partial_save_keeps_last_good_config(tmp_path):
+    path = tmp_path / 'tracked_products.json'
+    write(path, {'products': [entry(1), entry(2)], 'webhook': ''})
+    store = grosrat.ConfigStore(str(path))
+    assert len(store.get()['products']) == 2
+    
+    # Sauvegarde partielle d'un editeur: rien n'est retire, le fichier reste en place
+    path.write_text('{"products": [{"id": 1', encoding='utf-8')
+    assert store.refresh() == []
+    assert len(store.get()['products']) == 2
+    assert path.exists() and not list(tmp_path.glob('*.corrupt-*'))
+    
+    write(path, {'products': [entry(1), entry(2), entry(3)], 'webhook': ''})
+    os.utime(path, ns=(1, 1))
+    assert [(kind, value['id']) for kind, value in store.refresh()] == [('added', 3)]
+
+
+def test_truncated_journal_line_is_skipped_and_repaired(tmp_path, monkeypatch):
+    monkeypatch.setattr(grosrat.UI, 'headless', True)
+    path = str(tmp_path / 'tracked_products.json')
+    data = {'products': [entry(1)], 'webhook': ''}
+    grosrat.write_config(data, path)
+    data['products'].append(entry(2))
+    grosrat.append_journal(data, [{'op': 'add', 'entry': entry(2)}], path)
+    
+    # Crash au milieu de l'ecriture de la ligne suivante
+    with open(grosrat.journal_path(path), 'a', encoding='utf-8') as f:
+        f.write('{"op": "add", "entry": {"id": 3, "prod')
+    assert [p['id'] for p in grosrat.load_tracked_products(path)['products']] == [1, 2]
+    
+    # L'ajout suivant termine la ligne tronquee avant d'ecrire la sienne
+    data['products'].append(entry(4))
+    grosrat.append_journal(data, [{'op': 'add', 'entry': entry(4)}], path)
+    assert [p['id'] for p in grosrat.load_tracked_products(path)['products']] == [1, 2, 4]
+
+
+def test_replay_after_compaction_is_idempotent(tmp_path):
+    path = str(tmp_path / 'tracked_products.json')
+    data = {'products': [entry(1), entry(2)], 'webhook': ''}
+    grosrat.write_config(data, path)
+    ops = [{'op': 'add', 'entry': {**entry(2), 'threshold': 5.0}},
+           {'op': 'remove', 'id': 1},
+           {'op': 'batch', 'ops': [{'op': 'add', 'entry': entry(3)}]},
+           {'op': 'set', 'key': 'webhook', 'value': 'https://hook'}]
+    for op in ops:
+        grosrat.apply_journal_op(data, op)
+        grosrat.append_journal(data, [op], path)
+    expected = grosrat.load_tracked_products(path)
+    assert expected == {'products': [{**entry(2), 'threshold': 5.0}, entry(3)], 'webhook': 'https://hook'}
+    
+    # Crash entre l'ecriture compactee et la suppression du journal
+    journal = open(grosrat.journal_path(path), encoding='utf-8').read()
+    grosrat.write_config(expected, path)
+    with open(grosrat.journal_path(path), 'w', encoding='utf-8') as f:
+        f.write(journal)
+    assert grosrat.load_tracked_products(path) == expected
+
+
+def test_compaction_removes_journal(tmp_path, monkeypatch):
+    monkeypatch.setattr(grosrat, 'JOURNAL_COMPACT_BYTES', 1)
+    path = str(tmp_path / 'tracked_products.json')
+    data = {'products': [], 'webhook': ''}
+    grosrat.write_config(data, path)
+    for i in range(1, 4):
+        data['products'].append(entry(i))
+        grosrat.append_journal(data, [{'op': 'add', 'entry': entry(i)}], path)
+    assert not os.path.exists(grosrat.journal_path(path))
+    with open(path, encoding='utf-8') as f:
+        assert [p['id'] for p in json.load(f)['products']] == [1, 2, 3]
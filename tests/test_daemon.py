@@ -0,0 +1,37 @@
+import json
+import os
+import signal
+import sqlite3
+
+import grosrat
+
+
+def test_failed_batch_does_not_stop_the_daemon(tracker, monkeypatch):
+    with open(grosrat.CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'products': [{'id': 1, 'product': {'title': "P", 'url': "https://x/a-p1"},
+                                 'threshold': 10.0}], 'webhook': ''}, f)
+    monkeypatch.setattr(grosrat, 'BATCH_RETRY_SECONDS', 0)
+    calls = []
+    
+    def run_batch(due, webhook, scheduler, on_result):
+        calls.append([e.id for e in due])
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        os.kill(os.getpid(), signal.SIGTERM)
+    
+    monkeypatch.setattr(grosrat, 'run_batch', run_batch)
+    handlers = {sig: signal.getsignal(sig) for sig in (signal.SIGTERM, signal.SIGINT, signal.SIGHUP)}
+    try:
+        grosrat.run_daemon()
+    finally:
+        for sig, handler in handlers.items():
+            signal.signal(sig, handler)
+    # Le lot en echec est retente au lieu d'arreter le service
+    assert calls == [[1], [1]]
+
+
+def test_state_files_follow_config(tmp_path):
+    state_dir = os.path.dirname(os.path.abspath(str(tmp_path / 'etc' / 'tracked_products.json')))
+    assert grosrat.state_path(grosrat.HISTORY_DB, state_dir) == str(tmp_path / 'etc' / 'price_history.db')
+    assert grosrat.state_path('/var/lib/grosrat/x.db', state_dir) == '/var/lib/grosrat/x.db'
+    assert grosrat.parse_args(['daemon', '--state-dir', '/var/lib/grosrat']).state_dir == '/var/lib/grosrat'
@@ -0,0 +1,103 @@
+import grosrat
+
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, body=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.body = body or {}
+    
+    def json(self):
+        return self.body
+
+
+class FakeHttp:
+    def __init__(self, statuses):
+        self.statuses = list(statuses)
+        self.posts = []
+    
+    def post(self, url, json=None):
+        self.posts.append(json)
+        status = self.statuses.pop(0)
+        return status if isinstance(status, FakeResponse) else FakeResponse(status)
+
+
+class FakeClock:
+    """time.monotonic / time.sleep sans attente reelle"""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+def fake_clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(grosrat.time, 'monotonic', clock.monotonic)
+    monkeypatch.setattr(grosrat.time, 'sleep', clock.sleep)
+    return clock
+
+
+def test_sender_thread_does_not_print(capsys, monkeypatch):
+    monkeypatch.setattr(grosrat.UI, 'headless', False)
+    notifier = grosrat.DiscordNotifier(FakeHttp([200, 404]))
+    notifier.enqueue('https://hook/1', {'title': 'a'})
+    notifier.enqueue('https://hook/2', {'title': 'b'})
+    notifier.close(timeout=5)
+    
+    assert capsys.readouterr().out == ''
+    assert notifier.report() == (1, 1)
+    assert notifier.report() == (0, 0)
+
+
+def test_429_waits_retry_after_header(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    http = FakeHttp([FakeResponse(429, {'Retry-After': '2.5'}), 204])
+    notifier = grosrat.DiscordNotifier(http)
+    
+    assert notifier.post('https://hook/1', [{'title': 'a'}])
+    assert len(http.posts) == 2
+    assert clock.sleeps == [2.5]
+
+
+def test_429_waits_retry_after_body(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    http = FakeHttp([FakeResponse(429, body={'retry_after': 0.75}), 204])
+    notifier = grosrat.DiscordNotifier(http)
+    
+    assert notifier.post('https://hook/1', [{'title': 'a'}])
+    assert len(http.posts) == 2
+    assert clock.sleeps == [0.75]
+
+
+def test_empty_bucket_delays_next_message(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    exhausted = FakeResponse(204, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset-After': '3'})
+    http = FakeHttp([exhausted, 204])
+    notifier = grosrat.DiscordNotifier(http)
+    
+    assert notifier.post('https://hook/1', [{'title': 'a'}])
+    assert clock.sleeps == []
+    assert notifier._blocked_until == clock.now + 3
+    assert notifier.post('https://hook/1', [{'title': 'b'}])
+    assert clock.sleeps == [3.0]
+
+
+def test_flush_splits_embeds_per_message():
+    http = FakeHttp([204] * 3)
+    notifier = grosrat.DiscordNotifier(http)
+    for i in range(grosrat.DISCORD_MAX_EMBEDS * 2 + 3):
+        notifier.enqueue('https://hook/1', {'title': str(i)})
+    notifier.close(timeout=5)
+    
+    sizes = [len(payload['embeds']) for payload in http.posts]
+    assert sizes == [grosrat.DISCORD_MAX_EMBEDS, grosrat.DISCORD_MAX_EMBEDS, 3]
+    titles = [e['title'] for payload in http.posts for e in payload['embeds']]
+    assert titles == [str(i) for i in range(grosrat.DISCORD_MAX_EMBEDS * 2 + 3)]
+    assert notifier.report() == (grosrat.DISCORD_MAX_EMBEDS * 2 + 3, 0)
@@ -0,0 +1,41 @@
+import gzip
+import json
+import os
+
+import grosrat
+
+
+def read_segment(path):
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return [json.loads(line)['n'] for line in f]
+
+
+def test_rotation_compresses_and_drops_oldest_segment(tmp_path):
+    path = str(tmp_path / 'events.jsonl')
+    events = grosrat.EventLog(path, max_bytes=1, backups=3, compress=True)
+    for n in range(6):
+        events.emit('fetched', n=n)
+    events.close()
+    
+    segments = sorted(p for p in os.listdir(tmp_path) if p != 'events.jsonl')
+    assert segments == ['events.jsonl.1.gz', 'events.jsonl.2.gz', 'events.jsonl.3.gz']
+    assert read_segment(f"{path}.1.gz") == [5]
+    assert read_segment(f"{path}.2.gz") == [4]
+    assert read_segment(f"{path}.3.gz") == [3]
+    assert os.path.getsize(path) == 0
+
+
+def test_rotation_keeps_lines_below_max_bytes(tmp_path):
+    path = str(tmp_path / 'events.jsonl')
+    events = grosrat.EventLog(path, max_bytes=150, backups=2, compress=False)
+    for n in range(10):
+        events.emit('fetched', n=n)
+    events.close()
+    
+    lines = []
+    for name in (f"{path}.2", f"{path}.1", path):
+        with open(name, encoding='utf-8') as f:
+            lines += [json.loads(line)['n'] for line in f]
+    assert not os.path.exists(f"{path}.3")
+    assert lines == sorted(lines)
+    assert lines[-1] == 9
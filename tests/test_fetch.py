@@ -0,0 +1,110 @@
+import time
+
+import pytest
+
+from conftest import make_entry, product_page
+
+import grosrat
+
+
+URL = "https://www.toppreise.ch/preisvergleich/X/Produit-p1"
+
+
+def test_stored_product_url_follows_base_url(tracker, monkeypatch):
+    monkeypatch.setattr(grosrat, 'BASE_URL', "http://127.0.0.1:8765/mirror")
+    local = "http://127.0.0.1:8765/mirror/preisvergleich/X/Produit-p1"
+    tracker.pages[local] = product_page("Produit (REF-1)", [("Shop", 99.0)])
+    
+    details = grosrat.get_product_details(URL, silent=True)
+    assert tracker.calls == [local]
+    assert details['url'] == URL
+    assert details['best_price'] == 99.0
+
+
+def test_site_url_keeps_default_site_unchanged():
+    assert grosrat.site_url(URL, "https://www.toppreise.ch") == URL
+    assert grosrat.site_url("http://old:1/sub/preisvergleich/X/P-p2?a=1", "http://new") == \
+        "http://new/preisvergleich/X/P-p2?a=1"
+
+
+class SlowLimiter:
+    def wait(self, url):
+        time.sleep(0.2)
+        return 0.2
+
+
+class FakeSession:
+    def get(self, url, timeout=None, **kwargs):
+        return grosrat.StoredResponse(url, 200, "ok")
+
+
+def test_request_time_excludes_rate_limit_wait(monkeypatch):
+    metrics = grosrat.Metrics()
+    monkeypatch.setattr(grosrat, 'METRICS', metrics)
+    http = grosrat.HttpClient(rate_limiter=SlowLimiter())
+    http.session = FakeSession()
+    
+    t0 = time.perf_counter()
+    resp = http.get("http://127.0.0.1/p")
+    seconds = grosrat.record_response('product', resp, time.perf_counter() - t0)
+    
+    assert seconds < 0.1
+    hist = metrics.snapshot()['histograms']
+    assert hist['rate_limit_wait_seconds']['sum'] == 0.2
+    assert hist['product_fetch_seconds']['sum'] < 0.1
+
+
+def test_cache_file_is_not_rewritten_after_every_change(tmp_path, monkeypatch):
+    path = tmp_path / 'http_cache.json'
+    cache = grosrat.ResponseCache(path=str(path))
+    headers = {'ETag': '"1"'}
+    result = {'title': 'P', 'best_price': 1.0, 'offers': []}
+    
+    cache.put("https://x/a-p1", headers, result)
+    cache.save()
+    assert not path.exists()
+    
+    for i in range(grosrat.CACHE_SAVE_CHANGES):
+        cache.put(f"https://x/a-p{i}", headers, result)
+    cache.save()
+    assert path.exists()
+    
+    path.unlink()
+    cache.put("https://x/b-p1", headers, result)
+    cache.save(force=True)
+    assert path.exists()
+
+
+def test_max_workers_is_read_at_call_time(tracker, monkeypatch):
+    import threading
+    active, peak, lock = [0], [0], threading.Lock()
+    inner = tracker.get
+    
+    def counting(url, **kwargs):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return inner(url, **kwargs)
+    
+    monkeypatch.setattr(tracker, 'get', counting)
+    monkeypatch.setattr(grosrat, 'MAX_WORKERS', 1)
+    entries = [make_entry(i, f"https://www.toppreise.ch/preisvergleich/X/P-p{i}", 1.0) for i in range(4)]
+    list(grosrat.check_prices(entries, None))
+    assert peak[0] == 1
+
+
+def test_concurrency_options():
+    args = grosrat.parse_args(['daemon', '--max-workers', '3', '--rate-limit', '0.5'])
+    assert (args.max_workers, args.rate_limit) == (3, 0.5)
+
+
+def test_fetcher_without_get_fails_at_creation(tmp_path):
+    class NoGet(grosrat.Fetcher):
+        """Source sans get()"""
+    
+    with pytest.raises(TypeError, match='get'):
+        NoGet()
+    assert isinstance(grosrat.MemoryFetcher(grosrat.ReplayFetcher(str(tmp_path))), grosrat.Fetcher)
@@ -0,0 +1,44 @@
+from conftest import make_entry, product_page
+
+import grosrat
+
+
+URL = "https://www.toppreise.ch/preisvergleich/X/Produit-p1"
+
+
+def test_history_keeps_every_offer(tracker):
+    offers = [(f"Shop {i}", 100.0 + i) for i in range(12)]
+    tracker.pages[URL] = product_page("Produit (REF-1)", offers)
+    
+    details = grosrat.get_product_details(URL, silent=True)
+    assert len(details['offers']) == 12
+    
+    grosrat.HISTORY.record([{'url': URL, 'best_price': details['best_price'], 'offers': details['offers']}])
+    rows = grosrat.HISTORY._db().execute("SELECT COUNT(*) FROM offers").fetchone()[0]
+    assert rows == 12
+
+
+def test_history_enforces_foreign_keys(tracker):
+    grosrat.HISTORY.record([{'url': URL, 'best_price': 100.0, 'offers': [{'shop': 'A', 'price': 100.0}]}])
+    db = grosrat.HISTORY._db()
+    assert db.execute("PRAGMA foreign_keys").fetchone()[0] == 1
+    with db:
+        db.execute("DELETE FROM checks")
+    assert db.execute("SELECT COUNT(*) FROM offers").fetchone()[0] == 0
+
+
+def test_unchanged_result_still_counts_as_checked(tracker):
+    tracker.pages[URL] = product_page("Produit (REF-1)", [("A", 100.0), ("B", 110.0)])
+    entry = make_entry(1, URL, 50.0)
+    results = []
+    
+    for _ in range(3):
+        grosrat.run_batch([entry], None, on_result=lambda e, price, offers, interval, changes:
+                          results.append(changes))
+    
+    assert results[1:] == [[], []]
+    pid = grosrat.product_id_from_url(URL)
+    assert grosrat.HISTORY.stats(pid)['count'] == 3
+    assert len(grosrat.HISTORY.recent(pid, 10)) == 3
+    # Les offres ne sont ecrites qu'au premier releve
+    assert grosrat.HISTORY._db().execute("SELECT COUNT(*) FROM offers").fetchone()[0] == 2
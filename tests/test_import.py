@@ -0,0 +1,57 @@
+import json
+
+from conftest import make_entry, product_page
+
+import grosrat
+
+
+URL = "https://www.toppreise.ch/preisvergleich/X/Produit-p1"
+
+
+def test_import_reports_bad_lines_and_keeps_the_rest(tracker, tmp_path):
+    tracker.pages[URL] = product_page("Produit (REF-1)", [("Shop", 99.0)])
+    path = tmp_path / 'articles.jsonl'
+    path.write_text('\n'.join([
+        json.dumps({'url': URL, 'threshold': 90}),
+        '{"url": "' + URL + '", "threshold": ',
+        json.dumps({'url': URL, 'threshold': 80, 'interval_hours': -1}),
+        json.dumps({'url': URL, 'threshold': 70, 'interval_hours': 'inf'}),
+        json.dumps([URL, 60]),
+    ]) + '\n', encoding='utf-8')
+    
+    ids, errors = grosrat.import_products(str(path))
+    assert len(ids) == 1
+    assert [line for line, _ in errors] == [2, 3, 4, 5]
+    assert errors[0][1].startswith("JSON invalide")
+    assert errors[1][1] == errors[2][1] == "intervalle invalide"
+
+
+def test_entry_interval_has_a_floor():
+    assert grosrat.entry_interval(make_entry(1, URL, 10, interval_hours=0.0001)) == 60
+    assert grosrat.entry_interval(make_entry(1, URL, 10, interval_hours=float('nan'))) == \
+        grosrat.CHECK_INTERVAL_HOURS * 3600
+
+
+def test_export_import_keeps_paused_entries(tracker, tmp_path, monkeypatch):
+    tracker.pages[URL] = product_page("Produit (REF-1)", [("Shop", 99.0)])
+    path = tmp_path / 'articles.jsonl'
+    path.write_text('\n'.join([
+        json.dumps({'url': URL, 'threshold': 90}),
+        json.dumps({'url': URL, 'threshold': 80, 'active': False}),
+        json.dumps({'url': URL, 'threshold': 70, 'active': 'peut-etre'}),
+    ]) + '\n', encoding='utf-8')
+    ids, errors = grosrat.import_products(str(path))
+    assert len(ids) == 2
+    assert errors == [(3, "'active' invalide")]
+    
+    for name in ('export.csv', 'export.jsonl'):
+        export = tmp_path / name
+        assert grosrat.export_products(str(export)) == 2
+        rows = grosrat.read_import_rows(str(export))
+        assert [grosrat._import_flag(row['active']) for row in rows] == [True, False]
+        
+        monkeypatch.setattr(grosrat, 'CONFIG_FILE', str(tmp_path / f"{name}.json"))
+        monkeypatch.setattr(grosrat, 'CONFIG', grosrat.ConfigStore())
+        ids, errors = grosrat.import_products(str(export))
+        assert len(ids) == 2 and errors == []
+        assert [p['active'] for p in grosrat.CONFIG.get()['products']] == [True, False]
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+from conftest import product_page
+
+import grosrat
+
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+
+@pytest.fixture(params=['selectolax', 'lxml', 'html.parser'])
+def backend(request):
+    backend = grosrat.get_parser_backend(request.param)
+    if backend.name != request.param:
+        pytest.skip(f"{request.param} non installe")
+    return backend
+
+
+def summary(result):
+    return (result['title'], result['reference'], result['best_price'],
+            [(o['shop'], o['price']) for o in result['offers']], result['total_offers'])
+
+
+def test_real_page(backend):
+    with open(os.path.join(FIXTURES, 'product_fenix8.html'), encoding='utf-8') as f:
+        html = f.read()
+    assert summary(grosrat.extract_product(html, backend)) == (
+        "GARMINfenix 8 Pro - AMOLED, Sapphire, Graphit / Schwarz, 51 mm (010-03199-11)",
+        "010-03199-11",
+        998.0,
+        [("Galaxus", 998.0), ("digitec", 998.0), ("proforce.ch", 1019.5), ("interdiscount", 1019.95)],
+        4,
+    )
+
+
+@pytest.mark.parametrize('n_offers', [3, 200])
+def test_generated_pages_match_html_parser(backend, n_offers):
+    offers = [(f"Shop {i}", 500.0 + (i * 7) % 113) for i in range(n_offers)]
+    html = product_page("Produit test (ABC-123)", offers)
+    reference = grosrat.extract_product(html, grosrat.SoupBackend('html.parser'))
+    result = grosrat.extract_product(html, backend)
+    assert summary(result) == summary(reference)
+    assert result['reference'] == "ABC-123"
+    assert result['best_price'] == min(price for _, price in offers)
+    assert sorted((o['shop'], o['price']) for o in result['offers']) == sorted(offers)
+
+
+def test_incomplete_backend_fails_at_creation():
+    class NoKey(grosrat.ParserBackend):
+        """Backend sans key()"""
+        
+        def parse(self, html):
+            return html
+        
+        def select(self, node, selector):
+            return []
+        
+        def first(self, node, selector):
+            return None
+        
+        def parent(self, node):
+            return None
+        
+        def text(self, node):
+            return ''
+        
+        def attr(self, node, name):
+            return None
+    
+    with pytest.raises(TypeError, match='key'):
+        NoKey()
@@ -0,0 +1,45 @@
+import cProfile
+
+import pytest
+
+from conftest import make_entry, product_page
+
+import grosrat
+
+
+class ExclusiveProfile(cProfile.Profile):
+    """Comme cProfile sous Python 3.12+: un seul profileur actif a la fois"""
+    active = 0
+    
+    def enable(self, *args, **kwargs):
+        if ExclusiveProfile.active:
+            raise ValueError("Another profiling tool is already active")
+        ExclusiveProfile.active += 1
+        self.enabled = True
+        super().enable(*args, **kwargs)
+    
+    def disable(self):
+        if getattr(self, 'enabled', False):
+            ExclusiveProfile.active -= 1
+            self.enabled = False
+        super().disable()
+
+
+@pytest.mark.parametrize('all_threads', [True, False])
+def test_profiled_batch_checks_normally(tracker, tmp_path, monkeypatch, all_threads):
+    monkeypatch.setattr(grosrat.cProfile, 'Profile', ExclusiveProfile)
+    monkeypatch.setattr(grosrat, 'PROFILE_ALL_THREADS', all_threads)
+    monkeypatch.setattr(grosrat.PROFILER, 'folder', str(tmp_path / 'profiles'))
+    entries = []
+    for i in range(3):
+        url = f"https://www.toppreise.ch/preisvergleich/X/Produit-p{i}"
+        tracker.pages[url] = product_page(f"Produit {i}", [("Shop", 100.0 + i)])
+        entries.append(make_entry(i, url, 50.0))
+    
+    results = []
+    grosrat.PROFILER.request()
+    grosrat.run_batch(entries, None, on_result=lambda entry, price, *rest: results.append(price))
+    
+    assert results == [100.0, 101.0, 102.0]
+    assert len(list((tmp_path / 'profiles').glob('batch-*.pstats'))) == 1
+    assert ExclusiveProfile.active == 0
@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+import grosrat
+
+
+ENTRY = {
+    'id': 7,
+    'product': {'title': "Produit", 'reference': "REF-7", 'url': "https://x/a-p7",
+                'best_price': None, 'image': "a.png"},
+    'threshold': 90.0,
+    'window': None,
+    'note': {'tags': ["cadeau"]},
+}
+
+
+def test_dict_style_reads_match_the_json():
+    entry = grosrat.TrackedEntry.from_dict(ENTRY)
+    # Cle presente a null: None; cle absente: KeyError / defaut
+    assert entry['window'] is None
+    assert entry.get('window', 'x') is None
+    assert 'window' in entry
+    assert entry.get('interval_hours', 'x') == 'x'
+    assert 'interval_hours' not in entry
+    assert 'active' not in entry and entry.is_active
+    assert entry['note'] == {'tags': ["cadeau"]}
+    assert entry['product']['image'] == "a.png"
+    assert entry['product'].get('best_price', 'x') is None
+    with pytest.raises(KeyError):
+        entry['created']
+
+
+def test_round_trip_through_journal(tracker):
+    path = grosrat.CONFIG_FILE
+    data = {'products': [], 'webhook': ''}
+    grosrat.write_config(data, path)
+    
+    entry = grosrat.TrackedEntry.from_dict(json.loads(json.dumps(ENTRY)))
+    grosrat.append_journal(data, [{'op': 'add', 'entry': entry.to_dict()}], path)
+    
+    loaded = grosrat.load_tracked_products(path)
+    assert loaded['products'] == [ENTRY]
+    assert grosrat.TrackedEntry.from_dict(loaded['products'][0]) == entry
@@ -0,0 +1,128 @@
+from conftest import make_entry
+
+import grosrat
+
+
+def test_parse_window_rejects_past_midnight():
+    assert grosrat.parse_window("08:00-24:00") == (480, 1440)
+    assert grosrat.parse_window("08:00-24:30") is None
+    assert grosrat.parse_window("22:00-06:00") == (1320, 360)
+
+
+def test_sync_replans_changed_interval(tracker):
+    now = 1_000_000.0
+    scheduler = grosrat.Scheduler(adaptive=False)
+    scheduler.sync([make_entry(1, "https://x/a-p1", 10, interval_hours=24)], now)
+    assert scheduler.next_due() == now
+    scheduler.reschedule(scheduler.pop_due(now)[0], now)
+    assert scheduler.next_due() == now + 24 * 3600
+    
+    scheduler.sync([make_entry(1, "https://x/a-p1", 10, interval_hours=1)], now + 60)
+    assert scheduler.next_due() == now + 3600
+
+
+def test_sync_replans_changed_window(tracker):
+    now = 1_000_000.0
+    scheduler = grosrat.Scheduler(adaptive=False)
+    scheduler.sync([make_entry(1, "https://x/a-p1", 10)], now)
+    scheduler.reschedule(scheduler.pop_due(now)[0], now)
+    due = scheduler.next_due()
+    
+    window = "00:00-00:01"
+    scheduler.sync([make_entry(1, "https://x/a-p1", 10, window=window)], now + 60)
+    assert scheduler.next_due() == grosrat.next_in_window(due, window)
+    assert scheduler.next_due() != due
+
+
+def test_siblings_with_different_intervals_stay_together(tracker):
+    now = 1_000_000.0
+    scheduler = grosrat.Scheduler(adaptive=False)
+    url = "https://x/a-p1"
+    scheduler.sync([make_entry(1, url, 10, interval_hours=24),
+                    make_entry(2, url, 20, interval_hours=1)], now)
+    
+    # Le produit suit le plus petit intervalle de ses entrees, dans les deux ordres
+    for t in (now, now + 3600, now + 7200):
+        due = scheduler.pop_due(t)
+        assert sorted(e.id for e in due) == [1, 2]
+        for entry in (due if t != now + 3600 else reversed(due)):
+            assert scheduler.reschedule(entry, t) == 3600
+        assert scheduler.next_due() == t + 3600
+
+
+def test_new_sibling_joins_planned_product(tracker):
+    now = 1_000_000.0
+    scheduler = grosrat.Scheduler(adaptive=False)
+    url = "https://x/a-p1"
+    scheduler.sync([make_entry(1, url, 10, interval_hours=24)], now)
+    scheduler.reschedule(scheduler.pop_due(now)[0], now)
+    
+    scheduler.sync([make_entry(1, url, 10, interval_hours=24),
+                    make_entry(2, url, 20, interval_hours=6)], now + 60)
+    assert scheduler._due[1] == scheduler._due[2] == now + 24 * 3600
+
+
+def test_restart_resumes_from_last_check(tracker):
+    now = 1_000_000.0
+    urls = [f"https://x/a-p{i}" for i in range(1, 5)]
+    entries = [make_entry(i, url, 10, interval_hours=6) for i, url in enumerate(urls, 1)]
+    # Verifies il y a 2h (1, 2), il y a 7h (3) et jamais (4)
+    grosrat.HISTORY.record([{'url': urls[0], 'best_price': 1.0, 'checked_at': now - 7200},
+                            {'url': urls[1], 'best_price': 1.0, 'checked_at': now - 7200},
+                            {'url': urls[2], 'best_price': 1.0, 'checked_at': now - 7 * 3600}])
+    
+    scheduler = grosrat.Scheduler(adaptive=False)
+    scheduler.sync(entries, now)
+    assert scheduler._due[1] == scheduler._due[2] == now + 4 * 3600
+    assert sorted(scheduler._due[i] for i in (3, 4)) == [now, now + 3 * 3600]
+
+
+def trend(*prices, start=0.0):
+    """PriceTrend d'un releve par heure a partir de 'start'"""
+    return grosrat.PriceTrend((start + i * 3600, price) for i, price in enumerate(prices))
+
+
+def test_adaptive_near_threshold_checks_often():
+    entry = make_entry(1, "https://x/a-p1", 100, interval_hours=12)
+    lo = grosrat.ADAPTIVE_MIN_HOURS * 3600
+    near = 100 * (1 + grosrat.ADAPTIVE_MARGIN_PCT / 100)
+    
+    assert grosrat.adaptive_interval(entry, trend(near), 3600) == lo
+    assert grosrat.adaptive_interval(entry, trend(near + 1), 3600) == 12 * 3600
+    # Jamais plus long que l'intervalle configure
+    short = make_entry(2, "https://x/a-p2", 100, interval_hours=0.5)
+    assert grosrat.adaptive_interval(short, trend(near), 3600) == grosrat.entry_interval(short)
+
+
+def test_adaptive_volatile_price_divides_interval():
+    entry = make_entry(1, "https://x/a-p1", 100, interval_hours=12)
+    volatile = trend(150, 160, 150, 170)
+    assert volatile.moves == 3
+    assert grosrat.adaptive_interval(entry, volatile, 4 * 3600) == 4 * 3600
+    # Une seule variation: pas consideree comme volatile
+    assert grosrat.adaptive_interval(entry, trend(150, 150, 160), 3 * 3600) == 12 * 3600
+    # Jamais sous ADAPTIVE_MIN_HOURS
+    fast = make_entry(2, "https://x/a-p2", 100, interval_hours=2)
+    assert grosrat.adaptive_interval(fast, trend(150, 160, 150, 160, 150, 160), 6 * 3600) \
+        == grosrat.ADAPTIVE_MIN_HOURS * 3600
+
+
+def test_adaptive_stable_price_backs_off_up_to_cap():
+    entry = make_entry(1, "https://x/a-p1", 100, interval_hours=12)
+    base, hi = 12 * 3600, grosrat.ADAPTIVE_MAX_HOURS * 3600
+    period = grosrat.ADAPTIVE_STABLE_DAYS * 86400
+    stable = trend(150, 150, 150)
+    assert stable.last_change == 0.0
+    
+    assert grosrat.adaptive_interval(entry, stable, period - 1) == base
+    assert grosrat.adaptive_interval(entry, stable, period) == base * 2
+    assert grosrat.adaptive_interval(entry, stable, 2 * period) == min(hi, base * 4)
+    assert grosrat.adaptive_interval(entry, stable, 100 * period) == hi
+    # Intervalle configure au-dela du plafond: conserve tel quel
+    slow = make_entry(2, "https://x/a-p2", 100, interval_hours=72)
+    assert grosrat.adaptive_interval(slow, stable, 100 * period) == 72 * 3600
+
+
+def test_adaptive_without_prices_keeps_base_interval():
+    entry = make_entry(1, "https://x/a-p1", 100, interval_hours=12)
+    assert grosrat.adaptive_interval(entry, grosrat.PriceTrend(), 0) == 12 * 3600
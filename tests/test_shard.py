@@ -0,0 +1,52 @@
+import pytest
+
+from conftest import SentAlerts, make_entry, product_page
+
+import grosrat
+
+
+URL = "https://www.toppreise.ch/preisvergleich/X/Produit-p1"
+
+
+def switch_node(monkeypatch, tmp_path, name):
+    """Noeud 'name': baux partages, historique, alertes et envois propres au noeud"""
+    notifier = SentAlerts()
+    monkeypatch.setattr(grosrat, 'SHARD', grosrat.LeaseStore(str(tmp_path / 'leases.db'), name))
+    monkeypatch.setattr(grosrat, 'HISTORY', grosrat.PriceHistory(str(tmp_path / f'{name}.db')))
+    monkeypatch.setattr(grosrat, 'ALERTS', grosrat.AlertState(str(tmp_path / f'{name}-alerts.json')))
+    monkeypatch.setattr(grosrat, 'NOTIFIER', notifier)
+    monkeypatch.setattr(grosrat, 'HTTP_CACHE', grosrat.ResponseCache(path=None))
+    return notifier
+
+
+def test_alert_is_not_resent_by_another_node(tracker, tmp_path, monkeypatch):
+    tracker.pages[URL] = product_page("Produit (REF-1)", [("Shop", 90.0)])
+    entry = make_entry(1, URL, 100.0)
+    
+    sent_a = switch_node(monkeypatch, tmp_path, 'a')
+    grosrat.run_batch([entry], 'https://hook')
+    assert len(sent_a.embeds) == 1
+    grosrat.SHARD.close()
+    grosrat.HISTORY.close()
+    
+    # L'article passe au noeud b au cycle suivant: meme prix, pas de nouvel envoi
+    sent_b = switch_node(monkeypatch, tmp_path, 'b')
+    grosrat.run_batch([entry], 'https://hook')
+    assert sent_b.embeds == []
+    grosrat.SHARD.close()
+
+
+def test_leases_released_when_batch_is_interrupted(tracker, tmp_path, monkeypatch):
+    switch_node(monkeypatch, tmp_path, 'a')
+    entries = [make_entry(i, f"https://www.toppreise.ch/preisvergleich/X/P-p{i}", 100.0) for i in (1, 2)]
+    grosrat.SHARD.claim(['1', '2'])
+    
+    def interrupted(url, silent=False):
+        raise KeyboardInterrupt
+    
+    monkeypatch.setattr(grosrat, 'get_product_details', interrupted)
+    with pytest.raises(KeyboardInterrupt):
+        grosrat.run_batch(entries, None)
+    rows = grosrat.SHARD._db().execute("SELECT owner, next_due FROM leases ORDER BY product_key").fetchall()
+    assert rows == [(None, None), (None, None)]
+    grosrat.SHARD.close()
@@ -0,0 +1,34 @@
+import os
+import signal
+import time
+
+import pytest
+
+import grosrat
+
+
+pytestmark = pytest.mark.skipif(grosrat.HAS_MSVCRT, reason="self-pipe Unix")
+
+
+class LockedEvent:
+    """Event dont le verrou est deja pris par le fil principal"""
+    
+    def set(self):
+        raise AssertionError("Event.set() depuis un gestionnaire de signal")
+    
+    def clear(self):
+        pass
+
+
+def test_signal_wakes_wait_without_touching_the_event(monkeypatch):
+    monkeypatch.setattr(grosrat, 'WAKE', LockedEvent())
+    previous = signal.signal(signal.SIGUSR2, lambda signum, frame: grosrat.wake_up())
+    try:
+        os.kill(os.getpid(), signal.SIGUSR2)
+        t0 = time.monotonic()
+        assert grosrat.wait_for_wakeup(5)
+        assert time.monotonic() - t0 < 1
+    finally:
+        signal.signal(signal.SIGUSR2, previous)
+    # Reveil consomme: l'attente suivante va au bout du delai
+    assert not grosrat.wait_for_wakeup(0.05)